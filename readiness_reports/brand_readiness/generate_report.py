@@ -1,28 +1,46 @@
+import numpy as np
 import pandas as pd
 import os
 import tkinter as tk
 from tkinter import messagebox
 import re
 
-def is_filled(value):
+# Cell values (compared stripped and lowercased) that count as blank
+BLANK_SENTINELS = ("", "n/a")
+
+def normalize_sentinels(blank_sentinels):
+    return {str(s).strip().lower() for s in blank_sentinels}
+
+def is_filled(value, blank_sentinels=BLANK_SENTINELS):
     if pd.isna(value):
         return False
-    value = str(value).strip().lower()
-    return value != "" and value != "n/a"
+    return str(value).strip().lower() not in normalize_sentinels(blank_sentinels)
+
+def filled_mask(block, blank_sentinels=BLANK_SENTINELS):
+    """Boolean array shaped like block: True where is_filled() would be.
 
-def calculate_attribute_completion(df_data, headers, tiers):
+    Each distinct cell value is normalized once, then mapped back to every cell by code.
+    """
+    codes, uniques = pd.factorize(block.to_numpy(dtype=object).ravel())
+    # Missing values get code -1 and are never filled
+    unique_text = pd.Series(uniques, dtype=object).astype(str).str.strip().str.lower()
+    unique_filled = ~unique_text.isin(normalize_sentinels(blank_sentinels)).to_numpy()
+    filled = (codes >= 0) & np.append(unique_filled, False)[codes]
+    return filled.reshape(block.shape)
+
+def calculate_attribute_completion(df_data, headers, tiers, blank_sentinels=BLANK_SENTINELS):
     attr_data = []
     first_col = df_data.iloc[:, 0].astype(str)
     sellable_rows = df_data[first_col.str.strip().str.lower() == "sellable"]
 
+    non_blank = filled_mask(sellable_rows, blank_sentinels).sum(axis=0)
+    total = len(sellable_rows)
+
     for i, attr in enumerate(headers):
         if not attr:
             continue
         tier_label = tiers[i] if i < len(tiers) else ""
-        col = sellable_rows.iloc[:, i]
-        non_blank = col.apply(is_filled).sum()
-        total = len(col)
-        completion_pct = round(non_blank / total, 4) if total else 0.0
+        completion_pct = round(non_blank[i] / total, 4) if total else 0.0
         attr_data.append((attr, completion_pct, tier_label))
     return attr_data
 
@@ -54,7 +72,7 @@ def get_user_selected_sheets(sheet_names):
 
     return selected_sheets
 
-def process_workbook(input_path, selected_sheets):
+def process_workbook(input_path, selected_sheets, blank_sentinels=BLANK_SENTINELS):
     xl = pd.ExcelFile(input_path)
     static_blocks = []
 
@@ -69,9 +87,7 @@ def process_workbook(input_path, selected_sheets):
         data = df.iloc[3:].reset_index(drop=True)
         data.columns = headers
 
-        data = data.replace("N/A", "").replace("n/a", "").replace("N/a", "")
-
-        attr_completion = calculate_attribute_completion(data, headers, tiers)
+        attr_completion = calculate_attribute_completion(data, headers, tiers, blank_sentinels)
 
         print(f"\n[DEBUG] Sheet: {sheet_name}")
         print(f"[DEBUG] Tiers Found: {list(set(t for _, _, t in attr_completion))}")
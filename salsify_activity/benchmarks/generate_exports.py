@@ -0,0 +1,75 @@
+# === generate_exports.py ===
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from modules.load_data import SOURCES
+from modules.monthly_breakdown import PIM_TEAM, DREAMLINE_TEAM, MAAX_TEAM
+
+EXPORT_COLUMNS = ["Timestamp", "User Email", "Product ID", "Property Name", "Brand", "Property Value"]
+
+def generate_exports(out_dir, rows, users=200, brands=60, properties=400, start="2025-01-01", days=270,
+                     timezones=("-0500", "-0400"), seed=0):
+    """Write synthetic WCWQ* exports splitting `rows` across the six quarterly files; returns {env key: path}."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Real team members first so the monthly group tables are populated
+    team = sorted(PIM_TEAM | DREAMLINE_TEAM | MAAX_TEAM)
+    user_pool = np.array((team + [f"user{i}@example.com" for i in range(users)])[:max(users, 1)], dtype=object)
+    brand_pool = np.array(["DreamLine", "MAAX", "maax "] + [f"Brand {i}" for i in range(brands)], dtype=object)[:max(brands, 1)]
+    property_pool = np.array([f"Property {i}" for i in range(properties)], dtype=object)
+    tz_pool = np.array(list(timezones), dtype=object)
+
+    span_seconds = days * 86400
+    per_file = np.array_split(np.arange(rows), len(SOURCES))
+    start_ts = pd.Timestamp(start)
+    paths = {}
+
+    for i, (label, env_key) in enumerate(SOURCES.items()):
+        n = len(per_file[i])
+        lo = span_seconds * i // len(SOURCES)
+        hi = span_seconds * (i + 1) // len(SOURCES)
+
+        # Exports repeat the same second many times; format each distinct second once
+        seconds = rng.integers(lo, hi, n)
+        distinct, codes = np.unique(seconds, return_inverse=True)
+        stamps = (start_ts + pd.to_timedelta(distinct, unit="s")).strftime("%y-%m-%d %H:%M:%S").to_numpy(dtype=object)
+        timestamps = stamps[codes] + " " + tz_pool[rng.integers(0, len(tz_pool), n)]
+
+        frame = pd.DataFrame({
+            "Timestamp": timestamps,
+            "User Email": user_pool[rng.zipf(1.5, n) % len(user_pool)],
+            "Product ID": rng.integers(100000, 999999, n),
+            "Property Name": property_pool[rng.zipf(1.3, n) % len(property_pool)],
+            "Brand": brand_pool[rng.integers(0, len(brand_pool), n)],
+            "Property Value": rng.integers(0, 1000, n).astype(str),
+        }, columns=EXPORT_COLUMNS)
+
+        path = os.path.join(out_dir, f"{env_key}.csv")
+        frame.to_csv(path, index=False)
+        paths[env_key] = path
+
+    return paths
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic Salsify activity exports.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--brands", type=int, default=60)
+    parser.add_argument("--properties", type=int, default=400)
+    parser.add_argument("--start", default="2025-01-01")
+    parser.add_argument("--days", type=int, default=270)
+    parser.add_argument("--timezones", default="-0500,-0400", help="Comma-separated UTC offsets to mix")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    paths = generate_exports(
+        args.out_dir, args.rows, args.users, args.brands, args.properties,
+        args.start, args.days, tuple(args.timezones.split(",")), args.seed,
+    )
+    for env_key, path in paths.items():
+        print(f"{env_key}={path}")
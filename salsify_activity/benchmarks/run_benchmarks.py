@@ -0,0 +1,125 @@
+# === run_benchmarks.py ===
+import argparse
+import io
+import json
+import os
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+import pandas as pd
+from modules.load_data import load_data, READ_ENGINES
+from modules.schema import normalize_brands
+from modules.summarize import generate_summaries, generate_breakdowns
+from modules.cube import build_activity_cube
+from modules.monthly_breakdown import generate_monthly_brand_breakdowns
+from modules.report_builder import build_report_from_cube
+from modules.profiling import RssSampler
+from .generate_exports import generate_exports
+
+DEFAULT_SIZES = [100_000, 1_000_000, 10_000_000]
+# Written to the working directory (like the reports), never into the package tree
+DEFAULT_RESULTS = "benchmark_results.jsonl"
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_stage(name, rows, func):
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+
+    record = {
+        "stage": name,
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "rows_per_sec": round(rows / seconds) if seconds else None,
+        "peak_rss_mb": round(sampler.peak, 1) if sampler.peak is not None else None,
+        "peak_delta_mb": round(sampler.peak_delta, 1) if sampler.peak_delta is not None else None,
+    }
+    print(f"⏱️ {rows:>11,} rows | {name:<17} {seconds:8.2f}s  {record['rows_per_sec'] or 0:>12,} rows/s  "
+          f"peak RSS {record['peak_rss_mb'] or 0:8.1f} MB (+{record['peak_delta_mb'] or 0:.1f})")
+    return result, record
+
+def benchmark_size(rows, work_dir, engines=("pandas",), **generator_options):
+    data_dir = os.path.join(work_dir, f"exports_{rows}")
+    print(f"\n🧪 Generating {rows:,} synthetic rows in {data_dir}")
+    os.environ.update(generate_exports(data_dir, rows, **generator_options))
+
+    records = []
+
+    # The first engine's frame feeds the later stages; other engines are timed for comparison only
+    df = None
+    for engine in engines:
+        name = "load_data" if engine == "pandas" else f"load_data:{engine}"
+        loaded, rec = run_stage(name, rows, lambda: normalize_brands(load_data(use_cache=False, engine=engine)))
+        records.append(rec)
+        df = loaded if df is None else df
+        del loaded
+
+    def summarize():
+        top_fields, all_users, top_brands = generate_summaries(df)
+        generate_breakdowns(df, top_brands, "brand")
+        generate_breakdowns(df, top_fields, "property_name")
+    _, rec = run_stage("summarize", rows, summarize)
+    records.append(rec)
+
+    cube, rec = run_stage("cube", rows, lambda: build_activity_cube(df, verbose=False))
+    records.append(rec)
+
+    def monthly():
+        with pd.ExcelWriter(io.BytesIO(), engine="xlsxwriter") as writer:
+            generate_monthly_brand_breakdowns(cube, writer)
+    _, rec = run_stage("monthly_breakdown", rows, monthly)
+    records.append(rec)
+
+    report_path = os.path.join(work_dir, f"report_{rows}.xlsx")
+    _, rec = run_stage("report_builder", rows, lambda: build_report_from_cube(cube, report_path))
+    records.append(rec)
+
+    return records
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the salsify_activity pipeline on synthetic exports.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES, help="Dataset sizes to run")
+    parser.add_argument("--results", default=DEFAULT_RESULTS, help="JSON-lines file the results are appended to")
+    parser.add_argument("--work-dir", default=None, help="Where to write synthetic exports (default: a temp dir)")
+    parser.add_argument("--engines", nargs="+", choices=READ_ENGINES, default=list(READ_ENGINES), help="CSV readers to time in the load_data stage")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--brands", type=int, default=60)
+    parser.add_argument("--properties", type=int, default=400)
+    parser.add_argument("--days", type=int, default=270)
+    parser.add_argument("--timezones", default="-0500,-0400")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_info = {
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "git_rev": git_revision(),
+        "pandas": pd.__version__,
+    }
+    generator_options = {
+        "users": args.users,
+        "brands": args.brands,
+        "properties": args.properties,
+        "days": args.days,
+        "timezones": tuple(args.timezones.split(",")),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = args.work_dir or tmp_dir
+        with open(args.results, "a", encoding="utf-8") as results:
+            for rows in args.rows:
+                for record in benchmark_size(rows, work_dir, args.engines, **generator_options):
+                    results.write(json.dumps({**run_info, **record}) + "\n")
+                results.flush()
+
+    print(f"\n✅ Results appended to {args.results}")
@@ -1,18 +1,18 @@
-import pandas as pd
-import os
-from dotenv import load_dotenv
+import sys
+from modules.preflight import inspect_exports, preflight_failures
 
-# === Load .env ===
-load_dotenv()
-file_path = os.getenv("WCWQ1P1")
+# === Check every configured export (header row + sample) ===
+results = inspect_exports()
 
-if not file_path or not os.path.exists(file_path):
-    raise FileNotFoundError(f"Missing or invalid path for WCWQ1P1: {file_path}")
+# === Print column headers (even for exports that fail the checks) ===
+for label, result in results.items():
+    print(f"\n📄 Columns in {label} ({result['path']}):")
+    for col in result["columns"]:
+        print(f"- {col}")
 
-# === Read CSV (first row only, suppress dtype warnings) ===
-df = pd.read_csv(file_path, nrows=0, low_memory=False)
-
-# === Print column headers ===
-print("📄 Columns in file:")
-for col in df.columns:
-    print(f"- {col}")
+# === Report problems a full load would trip over ===
+failures = preflight_failures(results)
+if failures:
+    print("\n❌ Pre-flight check failed:\n  " + "\n  ".join(failures))
+    sys.exit(1)
+print(f"\n🛫 Pre-flight OK: {len(results)} exports checked")
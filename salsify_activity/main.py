@@ -1,52 +1,162 @@
 # === main.py ===
-from modules.load_data import load_data
-from modules.summarize import generate_summaries, generate_breakdowns
-from modules.report_builder import build_excel_report
+import argparse
+from modules.load_data import load_data, READ_ENGINES
+from modules.schema import normalize_brands
+from modules.cube import build_activity_cube, slice_cube
+from modules.bitmap_index import ActivityIndex
+from modules.report_builder import build_reports, build_distinct_products_report, REPORT_SHEETS, RAW_SHEET_COLUMNS
+from modules.summarize import build_distinct_sketches, distinct_summaries
+from modules.shared_dataset import shared_frames, HAS_PYARROW
+from modules.incremental import update_activity_store, load_distinct_sketches
+from modules.preflight import preflight_exports
+from modules.streaming import stream_activity_cube, DEFAULT_CHUNK_SIZE
+from modules.profiling import StageRecorder, stage, profile_run, peak_rss_mb
+from contextlib import nullcontext
 from datetime import datetime
 
-if __name__ == "__main__":
-    df = load_data()
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build Salsify activity reports.")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore the parquet cache and re-read every export")
+    parser.add_argument("--parallel", action="store_true", help="Ingest exports concurrently in a process pool")
+    parser.add_argument("--parallel-reports", action="store_true", help="Render each workbook in its own worker process")
+    parser.add_argument("--workers", type=int, default=None, help="Cap the number of worker processes")
+    parser.add_argument("--compact", action="store_true", help="Keep only report columns and store repeated strings as categoricals")
+    parser.add_argument("--engine", choices=READ_ENGINES, default="pandas", help="CSV reader: the pandas C parser or the multi-threaded pyarrow reader")
+    parser.add_argument("--no-dedupe", action="store_true", help="Keep rows that appear in more than one export")
+    parser.add_argument("--incremental", action="store_true", help="Only ingest rows newer than the stored watermarks and report from the persistent activity store")
+    parser.add_argument("--stream", action="store_true", help="Fold exports into aggregates chunk by chunk with bounded memory")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk in --stream mode")
+    parser.add_argument("--constant-memory", action="store_true", help="Stream workbook rows to disk instead of holding every cell in memory")
+    parser.add_argument("--sheets", nargs="+", choices=list(REPORT_SHEETS), default=None, help="Only compute and write these sheets (default: SALSIFY_SHEETS or all)")
+    parser.add_argument("--distinct-products", action="store_true", help="Also write distinct products touched per user/brand/month (HyperLogLog sketches, exact for small groups)")
+    parser.add_argument("--raw-sheet", action="store_true", help="Add a Raw Activity sheet with the underlying rows")
+    parser.add_argument("--skip-preflight", action="store_true", help="Don't check export headers and timestamp format before loading")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"], default=None, help="Profile the whole run and write the profiler output next to the reports")
+    parser.add_argument("--no-run-report", action="store_true", help="Don't write the JSON run report")
+    return parser.parse_args()
+
+def run(args, today_str):
+    df = None
+    sketches = None
+    if not args.skip_preflight:
+        with stage("preflight"):
+            preflight_exports(max_workers=args.workers)
+
+    if args.incremental:
+        with stage("load:incremental") as record:
+            cube = update_activity_store(engine=args.engine, dedupe=not args.no_dedupe)
+            record["rows"] = int(cube["change_count"].sum())
+    elif args.stream:
+        with stage("load:stream") as record:
+            sketches = {} if args.distinct_products else None
+            cube = stream_activity_cube(chunk_size=args.chunk_size, dedupe=not args.no_dedupe, sketches=sketches)
+            record["rows"] = int(cube["change_count"].sum())
+    else:
+        with stage("load") as record:
+            df = load_data(
+                use_cache=not args.no_cache,
+                parallel=args.parallel,
+                max_workers=args.workers,
+                compact=args.compact,
+                engine=args.engine,
+                dedupe=not args.no_dedupe,
+                keep_columns=["product_id"] if args.distinct_products else (),
+            )
+            record["rows"] = len(df)
+
+        # Normalize brand names
+        with stage("normalize_brands", rows=len(df)):
+            normalize_brands(df)
+
+        # Aggregate once; every report below is a slice of this cube
+        with stage("cube", rows=len(df)):
+            cube = build_activity_cube(df)
+
+    # Parallel workers map the cube and raw rows from shared Arrow files instead of
+    # each unpickling its own copy; the serial path slices in memory via the index
+    share = args.parallel_reports and HAS_PYARROW
+    if args.parallel_reports and not HAS_PYARROW:
+        print("⚠️ pyarrow not installed; parallel report workers get pickled slices")
+    raw_frame = df if args.raw_sheet else None
+    if args.raw_sheet and df is None:
+        print("⚠️ --raw-sheet needs the full load path; skipping Raw Activity sheets")
 
-    # Normalize brand names
-    df["brand"] = df["brand"].str.strip().str.lower()
+    if not share:
+        # Index only the dimension the slices below query; each slice is then a row-set lookup
+        with stage("index", rows=len(cube)):
+            cube_index = ActivityIndex(cube, dimensions=["brand"])
+            raw_index = ActivityIndex(raw_frame, dimensions=["brand"]) if raw_frame is not None else None
 
-    # === Individual brand reports ===
-    for brand in ["dreamline", "maax"]:
-        brand_df = df[df["brand"] == brand].copy()
+    frames = {"cube": cube}
+    if raw_frame is not None:
+        # Only the Raw Activity columns travel; free-form values may not fit one Arrow type
+        frames["raw"] = raw_frame[[col for col in RAW_SHEET_COLUMNS if col in raw_frame.columns]]
+    with shared_frames(frames) if share else nullcontext({}) as shared:
+        # === Individual brand reports ===
+        jobs = []
+        for brand in ["dreamline", "maax"]:
+            print(f"📊 Generating report for brand: {brand}")
+            if share:
+                brand_cube = shared["cube"].where(brand=brand)
+                raw_df = shared["raw"].where(brand=brand) if "raw" in shared else None
+            else:
+                brand_cube = slice_cube(cube, index=cube_index, brand=brand)
+                raw_df = raw_index.slice(brand=brand) if raw_index is not None else None
+            jobs.append((brand_cube, f"{brand}_report.xlsx", raw_df))
 
-        print(f"📊 Generating report for brand: {brand}")
+        # === Combined report: Who Did What - YYYY-MM-DD.xlsx ===
+        combined_filename = f"Who Did What - {today_str}.xlsx"
 
-        top_fields, all_users, top_brands = generate_summaries(brand_df)
-        brand_user_df = generate_breakdowns(brand_df, top_brands, "brand")
-        property_user_df = generate_breakdowns(brand_df, top_fields, "property_name")
+        print(f"📊 Generating combined report: {combined_filename}")
+        if share:
+            jobs.append((shared["cube"], combined_filename, shared.get("raw")))
+        else:
+            jobs.append((cube, combined_filename, raw_frame))
 
-        build_excel_report(
-            df=brand_df,
-            top_fields=top_fields,
-            all_users=all_users,
-            top_brands=top_brands,
-            brand_user_df=brand_user_df,
-            property_user_df=property_user_df,
-            output_filename=f"{brand}_report.xlsx"
+        build_reports(
+            jobs,
+            parallel=args.parallel_reports,
+            max_workers=args.workers,
+            constant_memory=args.constant_memory,
+            sheets=args.sheets,
         )
+    outputs = [filename for _, filename, _ in jobs]
 
-    # === Combined report: Who Did What - YYYY-MM-DD.xlsx ===
-    today_str = datetime.today().strftime("%Y-%m-%d")
-    combined_filename = f"Who Did What - {today_str}.xlsx"
+    # === Distinct products per user / brand / month ===
+    if args.distinct_products:
+        with stage("distinct_products"):
+            if args.incremental:
+                # Per-quarter sketches kept in the activity store, merged
+                sketches = load_distinct_sketches()
+            elif df is not None and "product_id" in df.columns:
+                sketches = build_distinct_sketches(df)
+
+            if not sketches:
+                print("⚠️ --distinct-products needs product IDs (no Product ID column in the exports); skipping")
+            else:
+                distinct_filename = f"Distinct Products - {today_str}.xlsx"
+                build_distinct_products_report(distinct_summaries(sketches), distinct_filename, args.constant_memory)
+                outputs.append(distinct_filename)
+
+    return {
+        "outputs": outputs,
+        "timestamp_stats": df.attrs.get("timestamp_stats") if df is not None else None,
+    }
 
-    print(f"📊 Generating combined report: {combined_filename}")
+if __name__ == "__main__":
+    args = parse_args()
+    today_str = datetime.today().strftime("%Y-%m-%d")
+    report_base = f"Run Report - {today_str}"
 
-    top_fields, all_users, top_brands = generate_summaries(df)
-    brand_user_df = generate_breakdowns(df, top_brands, "brand")
-    property_user_df = generate_breakdowns(df, top_fields, "property_name")
+    with StageRecorder() as recorder, profile_run(args.profile, report_base):
+        summary = run(args, today_str)
 
-    build_excel_report(
-        df=df,
-        top_fields=top_fields,
-        all_users=all_users,
-        top_brands=top_brands,
-        brand_user_df=brand_user_df,
-        property_user_df=property_user_df,
-        output_filename=combined_filename,
-    )
+    peak = peak_rss_mb()
+    print(f"\n📈 Run summary: {len(summary['outputs'])} workbooks, peak RSS {f'{peak:.1f} MB' if peak is not None else 'n/a'}")
+    for record in recorder.stages:
+        if "/" not in record["stage"]:
+            print(f"   {record['stage']:<40} {record['seconds']:8.2f}s")
 
+    if not args.no_run_report:
+        path = recorder.write_report(f"{report_base}.json", args=vars(args), **summary)
+        print(f"🧾 Run report written: {path}")
@@ -0,0 +1,124 @@
+# === bitmap_index.py ===
+import numpy as np
+import pandas as pd
+from .monthly_breakdown import classify_users
+
+INDEX_DIMENSIONS = ["brand", "user_email", "property_name", "Group", "month"]
+
+class RowSet:
+    """A set of row positions, stored as a packed bitmap when dense or sorted int32 positions when sparse.
+
+    Combine with & (AND) and | (OR); len() is the row count.
+    """
+
+    def __init__(self, n_rows, positions=None, bits=None):
+        self.n_rows = n_rows
+        self.positions = positions
+        self.bits = bits
+
+    @classmethod
+    def from_positions(cls, n_rows, positions):
+        positions = np.asarray(positions, dtype=np.int32)
+        # A bitmap costs n/8 bytes whatever it holds; positions cost 4 bytes each
+        if len(positions) * 32 > n_rows:
+            mask = np.zeros(n_rows, dtype=bool)
+            mask[positions] = True
+            return cls(n_rows, bits=np.packbits(mask))
+        return cls(n_rows, positions=positions)
+
+    @classmethod
+    def empty(cls, n_rows):
+        return cls(n_rows, positions=np.empty(0, dtype=np.int32))
+
+    def to_positions(self):
+        if self.positions is not None:
+            return self.positions
+        return np.flatnonzero(np.unpackbits(self.bits, count=self.n_rows)).astype(np.int32)
+
+    def contains(self, positions):
+        if self.bits is None:
+            return np.isin(positions, self.positions, assume_unique=True)
+        return ((self.bits[positions >> 3] >> (7 - (positions & 7))) & 1).astype(bool)
+
+    def __len__(self):
+        if self.bits is None:
+            return len(self.positions)
+        return int(np.bitwise_count(self.bits).sum())
+
+    def __and__(self, other):
+        if self.bits is not None and other.bits is not None:
+            return RowSet(self.n_rows, bits=self.bits & other.bits)
+        sparse, other = (self, other) if self.bits is None else (other, self)
+        positions = sparse.positions
+        return RowSet(self.n_rows, positions=positions[other.contains(positions)])
+
+    def __or__(self, other):
+        if self.bits is None and not len(self.positions):
+            return other
+        if other.bits is None and not len(other.positions):
+            return self
+        if self.bits is not None and other.bits is not None:
+            return RowSet(self.n_rows, bits=self.bits | other.bits)
+        return RowSet.from_positions(self.n_rows, np.union1d(self.to_positions(), other.to_positions()))
+
+def index_key(frame, dim):
+    """The frame's column for dim; month and Group are derived from raw rows when absent."""
+    if dim in frame.columns:
+        return frame[dim]
+    if dim == "month" and "timestamp" in frame.columns:
+        return frame["timestamp"].dt.month.astype("Int8")
+    if dim == "Group" and "user_email" in frame.columns:
+        return classify_users(frame["user_email"])
+    return None
+
+class ActivityIndex:
+    """Inverted index over an activity frame or cube: dimension -> value -> RowSet.
+
+    Built once with a single factorize + stable argsort per dimension; slices then
+    resolve by combining row sets instead of scanning columns.
+    """
+
+    def __init__(self, frame, dimensions=INDEX_DIMENSIONS):
+        self.frame = frame
+        self.n_rows = len(frame)
+        self.postings = {}
+
+        for dim in dimensions:
+            key = index_key(frame, dim)
+            if key is None:
+                continue
+            codes, uniques = pd.factorize(key, use_na_sentinel=True)
+            order = np.argsort(codes, kind="stable").astype(np.int32)
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            # Missing values (code -1) sort first and are left out of the index
+            bounds = np.concatenate([[0], np.cumsum(counts)]) + (codes < 0).sum()
+
+            self.postings[dim] = {
+                value: RowSet.from_positions(self.n_rows, order[bounds[i]:bounds[i + 1]])
+                for i, value in enumerate(pd.Index(uniques).tolist())
+            }
+
+    def lookup(self, dim, value):
+        if dim not in self.postings:
+            raise KeyError(f"'{dim}' is not indexed (indexed: {', '.join(self.postings)})")
+        return self.postings[dim].get(value, RowSet.empty(self.n_rows))
+
+    def rows(self, **filters):
+        """AND across dimensions; a list of values for one dimension is OR'ed."""
+        result = None
+        for dim, values in filters.items():
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            matched = RowSet.empty(self.n_rows)
+            for value in values:
+                matched = matched | self.lookup(dim, value)
+            result = matched if result is None else result & matched
+        return result
+
+    def take(self, row_set):
+        return self.frame.iloc[row_set.to_positions()]
+
+    def slice(self, **filters):
+        if not filters:
+            return self.frame
+        return self.take(self.rows(**filters))
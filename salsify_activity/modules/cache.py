@@ -0,0 +1,104 @@
+# === cache.py ===
+import hashlib
+import json
+import os
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Bump when the ingest logic changes so old parquet files are ignored
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = ".salsify_cache"
+MANIFEST_NAME = "manifest.json"
+
+def get_cache_dir(cache_dir=None):
+    return cache_dir or os.getenv("SALSIFY_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+def content_hash(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(cache_dir):
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        print(f"⚠️ Ignoring unreadable cache manifest: {manifest_path}")
+        return {}
+    if manifest.get("version") != CACHE_VERSION:
+        return {}
+    return manifest.get("files", {})
+
+def save_manifest(cache_dir, entries):
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "files": entries}, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def lookup_cached_frame(path, cache_dir, entries, usecols=None):
+    """Return the cached frame for path, or None if the file changed since it was cached."""
+    key = os.path.abspath(path)
+    entry = entries.get(key)
+    if not entry:
+        return None
+
+    # A cache written from a column subset can only serve requests within that subset
+    cached_cols = entry.get("usecols")
+    if cached_cols is not None and (usecols is None or not set(usecols) <= set(cached_cols)):
+        return None
+
+    parquet_path = os.path.join(cache_dir, entry["parquet"])
+    if not os.path.exists(parquet_path):
+        return None
+
+    stat = os.stat(path)
+    if stat.st_size != entry["size"]:
+        return None
+
+    if stat.st_mtime_ns != entry["mtime_ns"]:
+        # Touched but possibly unchanged (re-download, copy) — fall back to the content hash
+        if content_hash(path) != entry["sha"]:
+            return None
+        entry["mtime_ns"] = stat.st_mtime_ns
+
+    if usecols is None:
+        return pd.read_parquet(parquet_path)
+    stored = pq.read_schema(parquet_path).names
+    return pd.read_parquet(parquet_path, columns=[c for c in stored if c in usecols])
+
+def store_cached_frame(path, df, cache_dir, entries, usecols=None):
+    os.makedirs(cache_dir, exist_ok=True)
+    stat = os.stat(path)
+    sha = content_hash(path)
+    parquet_name = f"{sha}.parquet"
+
+    df.to_parquet(os.path.join(cache_dir, parquet_name), index=False)
+
+    key = os.path.abspath(path)
+    old = entries.get(key)
+    if old and old["parquet"] != parquet_name:
+        stale = os.path.join(cache_dir, old["parquet"])
+        if os.path.exists(stale) and not any(
+            e["parquet"] == old["parquet"] for k, e in entries.items() if k != key
+        ):
+            os.remove(stale)
+
+    entries[key] = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha": sha,
+        "parquet": parquet_name,
+        "usecols": list(usecols) if usecols is not None else None,
+    }
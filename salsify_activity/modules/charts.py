@@ -1,4 +1,5 @@
 # === charts.py ===
+from .write_helpers import write_table_sheet
 
 def insert_summary_chart(wb, ws, title, label_col, value_col, count):
     chart = wb.add_chart({"type": "column"})
@@ -13,12 +14,13 @@ def insert_summary_chart(wb, ws, title, label_col, value_col, count):
     chart.set_size({'width': 900, 'height': 600})
     ws.insert_chart("D2", chart)
 
-def insert_changes_over_time_sheet(writer, df):
-    df["date"] = df["timestamp"].dt.date
-    daily_counts = df.groupby("date").size().reset_index(name="change_count")
-
+def insert_changes_over_time_sheet(writer, daily_counts, constant_memory=False):
     sheet_name = "Changes Over Time"
-    daily_counts.to_excel(writer, sheet_name=sheet_name, index=False)
+    if constant_memory:
+        date_format = writer.book.add_format({"num_format": "yyyy-mm-dd"})
+        write_table_sheet(writer, daily_counts, sheet_name, {"date": date_format})
+    else:
+        daily_counts.to_excel(writer, sheet_name=sheet_name, index=False)
 
     if daily_counts.empty:
         print("⚠️ Skipping 'Changes Over Time' chart: No valid timestamp data.")
@@ -38,3 +40,33 @@ def insert_changes_over_time_sheet(writer, df):
     chart.set_y_axis({"name": "Number of Changes"})
     chart.set_size({"width": 900, "height": 400})
     ws.insert_chart("D2", chart)
+
+def insert_rolling_activity_sheet(writer, rolling, constant_memory=False):
+    sheet_name = "Rolling Activity"
+    if constant_memory:
+        date_format = writer.book.add_format({"num_format": "yyyy-mm-dd"})
+        write_table_sheet(writer, rolling, sheet_name, {"date": date_format})
+    else:
+        rolling.to_excel(writer, sheet_name=sheet_name, index=False)
+
+    # The "all" rows come first, one per day
+    total_rows = int((rolling["scope"] == "all").sum())
+    if not total_rows:
+        print("⚠️ Skipping 'Rolling Activity' chart: No valid timestamp data.")
+        return
+
+    wb = writer.book
+    ws = writer.sheets[sheet_name]
+
+    chart = wb.add_chart({"type": "line"})
+    for col in range(3, len(rolling.columns)):
+        chart.add_series({
+            "name":       [sheet_name, 0, col],
+            "categories": [sheet_name, 1, 0, total_rows, 0],
+            "values":     [sheet_name, 1, col, total_rows, col],
+        })
+    chart.set_title({"name": "Rolling Change Volume"})
+    chart.set_x_axis({"name": "Date"})
+    chart.set_y_axis({"name": "Number of Changes"})
+    chart.set_size({"width": 900, "height": 400})
+    ws.insert_chart(1, len(rolling.columns) + 1, chart)
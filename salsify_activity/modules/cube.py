@@ -0,0 +1,88 @@
+# === cube.py ===
+import pandas as pd
+from .monthly_breakdown import classify_users
+from .summarize import top_users_per_group
+
+CUBE_DIMENSIONS = ["date", "month", "brand", "property_name", "user_email", "Group"]
+
+def build_activity_cube(df, verbose=True):
+    """Collapse raw activity rows into change counts per date × month × brand × property × user × group."""
+    timestamps = df["timestamp"]
+    keys = pd.DataFrame({
+        "date": timestamps.dt.normalize().dt.tz_localize(None),
+        "month": timestamps.dt.month.astype("Int8"),
+        "brand": df["brand"],
+        "property_name": df["property_name"],
+        "user_email": df["user_email"],
+    })
+
+    cube = (
+        keys.groupby(list(keys.columns), sort=False, observed=True, dropna=False)
+        .size()
+        .reset_index(name="change_count")
+    )
+
+    cube["Group"] = classify_users(cube["user_email"])
+
+    if verbose:
+        print(f"🧊 Built activity cube: {len(df)} rows -> {len(cube)} cells")
+    return cube[CUBE_DIMENSIONS + ["change_count"]]
+
+def merge_cubes(cubes):
+    cubes = [c for c in cubes if c is not None and not c.empty]
+    if not cubes:
+        return pd.DataFrame(columns=CUBE_DIMENSIONS + ["change_count"])
+
+    combined = pd.concat(cubes, ignore_index=True)
+    for col in ["brand", "property_name", "user_email", "Group"]:
+        combined[col] = combined[col].astype(object)
+
+    return (
+        combined.groupby(CUBE_DIMENSIONS, sort=False, dropna=False)["change_count"]
+        .sum()
+        .reset_index()
+    )
+
+def slice_cube(cube, index=None, **filters):
+    # An ActivityIndex over this cube resolves the filters without scanning columns
+    if index is not None:
+        return index.slice(**filters)
+    mask = pd.Series(True, index=cube.index)
+    for col, val in filters.items():
+        mask &= cube[col] == val
+    return cube[mask]
+
+def sum_by(cube, cols):
+    if isinstance(cols, str):
+        cols = [cols]
+    return cube.groupby(cols, sort=False, observed=True)["change_count"].sum()
+
+def top_counts(cube, col, label, limit=None):
+    counts = sum_by(cube, col)
+    counts = counts[counts > 0].sort_values(ascending=False, kind="stable")
+    if limit is not None:
+        counts = counts.head(limit)
+    counts.index = counts.index.astype(object)
+    return counts.rename_axis(label).reset_index(name="change_count")
+
+def cube_top_properties(cube):
+    return top_counts(cube, "property_name", "property_name", limit=50)
+
+def cube_all_users(cube):
+    return top_counts(cube, "user_email", "user")
+
+def cube_top_brands(cube):
+    return top_counts(cube, "brand", "brand", limit=50)
+
+def cube_summaries(cube):
+    return cube_top_properties(cube), cube_all_users(cube), cube_top_brands(cube)
+
+def cube_breakdowns(cube, top_items, group_col, top_n=5):
+    subset = cube[cube[group_col].isin(top_items[group_col].tolist())]
+    counts = sum_by(subset, [group_col, "user_email"]).reset_index(name="change_count")
+    return top_users_per_group(counts, top_items, group_col, top_n)
+
+def cube_daily_counts(cube):
+    daily = sum_by(cube.dropna(subset=["date"]), "date").sort_index()
+    daily.index = daily.index.date
+    return daily.rename_axis("date").reset_index(name="change_count")
@@ -0,0 +1,68 @@
+# === dedupe.py ===
+import os
+import numpy as np
+import pandas as pd
+from .schema import canonical_text
+
+# What makes two activity rows the same change; columns an export lacks are skipped
+FINGERPRINT_COLUMNS = ["timestamp", "user_email", "product_id", "property_name", "property_value"]
+SEEN_INDEX_NAME = "seen_index.npy"
+
+def activity_fingerprints(df):
+    """One 64-bit hash per row over the fingerprint columns, vectorized through hash_pandas_object."""
+    keys = {}
+    for col in FINGERPRINT_COLUMNS:
+        if col not in df.columns:
+            continue
+        # Exports disagree on whether IDs/values parse as numbers; hash them as canonical text
+        keys[col] = df[col] if col == "timestamp" else canonical_text(df[col])
+    return pd.util.hash_pandas_object(pd.DataFrame(keys, index=df.index), index=False).to_numpy()
+
+def is_first_seen(hashes):
+    """Mask of hashes not repeated earlier in the batch."""
+    return ~pd.Series(hashes, dtype=np.uint64).duplicated().to_numpy()
+
+class SeenIndex:
+    """Row fingerprints already counted, optionally persisted as a .npy file.
+
+    Held as one sorted uint64 array (8 bytes per fingerprint): a batch is checked with
+    np.searchsorted and its new fingerprints are merged in with np.insert.
+    """
+
+    def __init__(self, hashes=None):
+        self.hashes = np.unique(np.asarray(hashes if hashes is not None else [], dtype=np.uint64))
+
+    @classmethod
+    def load(cls, path):
+        return cls(np.load(path)) if os.path.exists(path) else cls()
+
+    def save(self, path):
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, self.hashes)
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def filter_new(self, hashes):
+        """Mask of rows seen for the first time (within the batch and against the index); records them."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        keep = is_first_seen(hashes)
+        if len(self.hashes):
+            candidates = hashes[keep]
+            pos = np.searchsorted(self.hashes, candidates)
+            found = self.hashes[np.minimum(pos, len(self.hashes) - 1)] == candidates
+            keep[keep] = ~found
+        new = np.sort(hashes[keep])
+        self.hashes = np.insert(self.hashes, np.searchsorted(self.hashes, new), new)
+        return keep
+
+def dedupe_activity(df, seen=None, label="activity"):
+    """Drop rows whose fingerprint repeats earlier in df or, given a SeenIndex, is already in `seen`."""
+    hashes = activity_fingerprints(df)
+    keep = seen.filter_new(hashes) if seen is not None else is_first_seen(hashes)
+    dropped = len(df) - int(keep.sum())
+    if not dropped:
+        return df
+    print(f"🧹 {label}: dropped {dropped} duplicate rows of {len(df)}")
+    return df[keep].reset_index(drop=True)
@@ -0,0 +1,241 @@
+# === incremental.py ===
+import glob
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from .load_data import get_source_paths, ingest_file, resolve_engine
+from .schema import normalize_brands
+from .cube import build_activity_cube, merge_cubes
+from .dedupe import SEEN_INDEX_NAME, SeenIndex, activity_fingerprints
+from .summarize import build_distinct_sketches, merge_sketch_maps, save_sketch_maps, load_sketch_maps
+
+DEFAULT_STORE_DIR = ".salsify_store"
+STATE_NAME = "watermarks.json"
+CUBE_NAME = "cube.parquet"
+ACTIVITY_DIR = "activity"
+SKETCH_DIR = "sketches"
+# Files a run writes carry this suffix until the new watermarks are saved; see commit_store
+PENDING_SUFFIX = ".pending"
+PENDING_KEY = "_pending"
+
+def get_store_dir(store_dir=None):
+    return store_dir or os.getenv("SALSIFY_STORE_DIR", DEFAULT_STORE_DIR)
+
+def row_hashes(df):
+    """Raw whole-row hashes; only read back from watermarks written before boundary_fingerprints."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+def load_state(store_dir):
+    state_path = os.path.join(store_dir, STATE_NAME)
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_state(store_dir, state):
+    state_path = os.path.join(store_dir, STATE_NAME)
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+def select_new_rows(df, mark):
+    """Rows past the source's high-water mark; ties on the mark timestamp are resolved by row fingerprint."""
+    if not mark or not mark.get("max_timestamp"):
+        return df
+
+    watermark = pd.Timestamp(mark["max_timestamp"])
+    timestamps = df["timestamp"]
+    is_new = (timestamps > watermark).to_numpy()
+
+    on_mark = (timestamps == watermark).to_numpy()
+    if on_mark.any():
+        # Fingerprints don't depend on the dtypes this drop happened to be read with
+        seen = np.array(mark.get("boundary_fingerprints", []), dtype=np.uint64)
+        is_seen = np.isin(activity_fingerprints(df[on_mark]), seen)
+        if mark.get("boundary_hashes"):
+            is_seen |= np.isin(row_hashes(df[on_mark]), np.array(mark["boundary_hashes"], dtype=np.uint64))
+        is_new[on_mark] = ~is_seen
+
+    return df[is_new]
+
+def advance_watermark(new_rows, mark):
+    mark = dict(mark or {})
+    timestamps = new_rows["timestamp"].dropna()
+    if timestamps.empty:
+        return mark
+
+    max_ts = timestamps.max()
+    hashes = activity_fingerprints(new_rows[new_rows["timestamp"] == max_ts]).tolist()
+    if mark.get("max_timestamp") and pd.Timestamp(mark["max_timestamp"]) == max_ts:
+        hashes = sorted(set(hashes) | set(mark.get("boundary_fingerprints", [])))
+    else:
+        mark.pop("boundary_hashes", None)
+
+    mark["max_timestamp"] = max_ts.isoformat()
+    mark["boundary_fingerprints"] = hashes
+    return mark
+
+def load_seen_index(store_dir):
+    """Fingerprints of every stored row; rebuilt from the activity parts if the index file is missing."""
+    index_path = os.path.join(store_dir, SEEN_INDEX_NAME)
+    if os.path.exists(index_path):
+        return SeenIndex.load(index_path)
+
+    seen = SeenIndex()
+    parts = sorted(glob.glob(os.path.join(store_dir, ACTIVITY_DIR, "*.parquet")))
+    for part in parts:
+        seen.filter_new(activity_fingerprints(pd.read_parquet(part)))
+    if parts:
+        print(f"🧹 Rebuilt seen-index from {len(parts)} stored parts: {len(seen)} fingerprints")
+    return seen
+
+def quarter_labels(timestamps):
+    """UTC quarter per row ("2025Q1"); rows without a timestamp are "undated"."""
+    quarters = timestamps.dt.tz_localize(None).dt.to_period("Q").astype(str)
+    return quarters.where(timestamps.notna(), "undated")
+
+def quarter_sketches(rows):
+    """{quarter: build_distinct_sketches(rows in that quarter)}; empty without product IDs."""
+    if "product_id" not in rows.columns or rows.empty:
+        return {}
+    return {
+        quarter: build_distinct_sketches(part)
+        for quarter, part in rows.groupby(quarter_labels(rows["timestamp"]), sort=True)
+    }
+
+def merge_quarter_sketches(*quarter_maps):
+    merged = {}
+    for quarters in quarter_maps:
+        for quarter, sketches in quarters.items():
+            merged[quarter] = merge_sketch_maps(merged[quarter], sketches) if quarter in merged else sketches
+    return merged
+
+def rebuild_quarter_sketches(store_dir):
+    """Per-quarter sketches of the stored activity parts, for stores that predate them."""
+    if os.path.isdir(os.path.join(store_dir, SKETCH_DIR)):
+        return {}
+    parts = sorted(glob.glob(os.path.join(store_dir, ACTIVITY_DIR, "*.parquet")))
+    rebuilt = merge_quarter_sketches(*(quarter_sketches(pd.read_parquet(part)) for part in parts))
+    if parts:
+        print(f"🔢 Rebuilt distinct-product sketches from {len(parts)} stored parts")
+    return rebuilt
+
+def write_quarter_sketches(store_dir, updates):
+    """Fold {quarter: sketches} into the stored quarter files, written as pending; returns their paths."""
+    sketch_dir = os.path.join(store_dir, SKETCH_DIR)
+    os.makedirs(sketch_dir, exist_ok=True)
+    written = []
+    for quarter, sketches in updates.items():
+        path = os.path.join(sketch_dir, f"{quarter}.npz")
+        if os.path.exists(path):
+            sketches = merge_sketch_maps(load_sketch_maps(path), sketches)
+        save_sketch_maps(path + PENDING_SUFFIX, sketches)
+        written.append(path)
+    return written
+
+def recover_store(store_dir, state):
+    """Finish or roll back a run that stopped between writing its files and promoting them.
+
+    Pending files listed in the saved state belong to a committed run and are promoted;
+    any other pending file was written by a run that never saved its watermarks.
+    """
+    committed = set(state.pop(PENDING_KEY, []))
+    leftovers = glob.glob(os.path.join(store_dir, "**", "*" + PENDING_SUFFIX), recursive=True)
+    promoted = 0
+    for pending in leftovers:
+        target = pending[:-len(PENDING_SUFFIX)]
+        if os.path.relpath(target, store_dir) in committed:
+            os.replace(pending, target)
+            promoted += 1
+        else:
+            os.remove(pending)
+    if committed or leftovers:
+        print(f"🩹 Activity store: recovered an interrupted run ({promoted} files promoted, {len(leftovers) - promoted} discarded)")
+        save_state(store_dir, state)
+    return state
+
+def commit_store(store_dir, state, targets):
+    """Save the watermarks (the commit point), then move each pending file onto its target path."""
+    state[PENDING_KEY] = [os.path.relpath(target, store_dir) for target in targets]
+    save_state(store_dir, state)
+    for target in targets:
+        os.replace(target + PENDING_SUFFIX, target)
+    state.pop(PENDING_KEY)
+    save_state(store_dir, state)
+
+def load_distinct_sketches(store_dir=None):
+    """Every stored quarter's sketches merged into one map per scope; None if the store has none."""
+    paths = sorted(glob.glob(os.path.join(get_store_dir(store_dir), SKETCH_DIR, "*.npz")))
+    if not paths:
+        return None
+    return merge_sketch_maps(*(load_sketch_maps(path) for path in paths))
+
+def update_activity_store(store_dir=None, engine="pandas", dedupe=True):
+    """Ingest only rows newer than each source's watermark and return the full, updated activity cube.
+
+    With dedupe, rows already stored from any export (overlapping P1/P2 pulls) are skipped
+    using a persistent index of row fingerprints. New rows are also folded into per-quarter
+    distinct-product sketches (see load_distinct_sketches).
+    """
+    paths = get_source_paths()
+    engine = resolve_engine(engine)
+    store_dir = get_store_dir(store_dir)
+    os.makedirs(os.path.join(store_dir, ACTIVITY_DIR), exist_ok=True)
+
+    state = recover_store(store_dir, load_state(store_dir))
+    seen = load_seen_index(store_dir) if dedupe else None
+    cube_path = os.path.join(store_dir, CUBE_NAME)
+    stored_cube = pd.read_parquet(cube_path) if os.path.exists(cube_path) else None
+    sketch_updates = rebuild_quarter_sketches(store_dir)
+
+    # Everything below is written with PENDING_SUFFIX and only takes effect in commit_store,
+    # so an interrupted run can't leave rows stored without their watermark
+    targets = []
+    new_cubes = []
+    for label, path in paths.items():
+        mark = state.get(label, {})
+        stat = os.stat(path)
+        if mark.get("path") == os.path.abspath(path) and mark.get("size") == stat.st_size and mark.get("mtime_ns") == stat.st_mtime_ns:
+            print(f"⏭️ {label}: unchanged since last run")
+            continue
+
+        df = normalize_brands(ingest_file(path, label, engine=engine))
+        new_rows = select_new_rows(df, mark)
+        # The watermark moves on past-mark rows even when they turn out to be duplicates
+        fresh = new_rows
+        if dedupe and not new_rows.empty:
+            fresh = new_rows[seen.filter_new(activity_fingerprints(new_rows))]
+            if len(fresh) < len(new_rows):
+                print(f"🧹 {label}: {len(new_rows) - len(fresh)} rows already stored from an overlapping export")
+        print(f"➕ {label}: {len(fresh)} new of {len(df)} rows")
+
+        if not fresh.empty:
+            part_path = os.path.join(store_dir, ACTIVITY_DIR, f"{label}-{time.strftime('%Y%m%d%H%M%S')}.parquet")
+            fresh.to_parquet(part_path + PENDING_SUFFIX, index=False)
+            targets.append(part_path)
+            new_cubes.append(build_activity_cube(fresh))
+            sketch_updates = merge_quarter_sketches(sketch_updates, quarter_sketches(fresh))
+        if not new_rows.empty:
+            mark = advance_watermark(new_rows, mark)
+
+        mark.update({"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+        state[label] = mark
+
+    if new_cubes or stored_cube is None:
+        cube = merge_cubes([stored_cube] + new_cubes)
+        cube.to_parquet(cube_path + PENDING_SUFFIX, index=False)
+        targets.append(cube_path)
+    else:
+        cube = stored_cube
+
+    targets += write_quarter_sketches(store_dir, sketch_updates)
+    if dedupe:
+        index_path = os.path.join(store_dir, SEEN_INDEX_NAME)
+        seen.save(index_path + PENDING_SUFFIX)
+        targets.append(index_path)
+    commit_store(store_dir, state, targets)
+    print(f"🗄️ Activity store: {int(cube['change_count'].sum())} changes in {len(cube)} cube cells")
+    return cube
@@ -1,37 +1,242 @@
 # === load_data.py ===
+import csv
 import os
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
+from .cache import (
+    HAS_PYARROW,
+    get_cache_dir,
+    load_manifest,
+    save_manifest,
+    lookup_cached_frame,
+    store_cached_frame,
+)
+from .timestamps import parse_export_timestamps, parse_export_timestamps_arrow
+from .profiling import stage
+from .dedupe import FINGERPRINT_COLUMNS, dedupe_activity
+from .schema import (
+    REQUIRED_COLUMNS,
+    COMPACT_COLUMNS,
+    normalize_column_name,
+    memory_mb,
+    compact_frame,
+    align_categories,
+)
 
-def load_and_prepare(path, label, skip_header=False):
+SOURCES = {
+    "Q1P1": "WCWQ1P1",
+    "Q1P2": "WCWQ1P2",
+    "Q2P1": "WCWQ2P1",
+    "Q2P2": "WCWQ2P2",
+    "Q3P1": "WCWQ3P1",
+    "Q3P2": "WCWQ3P2",
+}
+
+def get_source_paths():
+    load_dotenv()
+    paths = {label: os.getenv(env_key) for label, env_key in SOURCES.items()}
+
+    for label, path in paths.items():
+        if not path or not os.path.exists(path):
+            raise FileNotFoundError(f"Missing or invalid path for {SOURCES[label]}: {path}")
+    return paths
+
+READ_ENGINES = ("pandas", "arrow")
+
+def read_header(path, skip_header=False):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        if skip_header:
+            next(reader, None)
+        return next(reader, [])
+
+def infer_arrow_column(column):
+    """Mirror pandas' inference for non-report columns: int64, then float64, otherwise keep the strings."""
+    import pyarrow as pa
+
+    for target in (pa.int64(), pa.float64()):
+        try:
+            return column.cast(target)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            continue
+    return column
+
+def read_csv_arrow(path, skip_header=False, usecols=None):
+    """Multi-threaded pyarrow CSV read with explicit string types; timestamps are parsed while still in Arrow."""
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    names = read_header(path, skip_header)
+    if usecols is not None:
+        keep = set(usecols)
+        names = [name for name in names if normalize_column_name(name) in keep]
+
+    # Everything is read as text so a stray value deep in a file can't break type inference mid-read
+    table = pacsv.read_csv(
+        path,
+        read_options=pacsv.ReadOptions(use_threads=True, skip_rows=1 if skip_header else 0),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=names,
+            column_types={name: pa.string() for name in names},
+            strings_can_be_null=True,
+        ),
+    )
+
+    for i, name in enumerate(table.column_names):
+        normalized = normalize_column_name(name)
+        if normalized == "timestamp":
+            table = table.set_column(i, name, parse_export_timestamps_arrow(table.column(i)))
+        elif normalized not in REQUIRED_COLUMNS:
+            table = table.set_column(i, name, infer_arrow_column(table.column(i)))
+
+    df = table.to_pandas()
+    # Arrow hands back None for empty text cells; the pandas reader gives NaN
+    for name in table.column_names:
+        if df[name].dtype == object and table.column(name).null_count:
+            df[name] = df[name].fillna(np.nan)
+    return df
+
+def load_and_prepare(path, label, skip_header=False, usecols=None, engine="pandas"):
     print(f"\n📂 Loading file: {label} ({path})")
-    df = pd.read_csv(path, skiprows=1 if skip_header else 0, low_memory=False)
+    if engine == "arrow":
+        df = read_csv_arrow(path, skip_header, usecols)
+    else:
+        if usecols is not None:
+            keep = set(usecols)
+            usecols = lambda col: normalize_column_name(col) in keep
+        df = pd.read_csv(path, skiprows=1 if skip_header else 0, usecols=usecols, low_memory=False)
     print(f"🔎 {label} original columns: {df.columns.tolist()}")
-    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+    df.columns = [normalize_column_name(col) for col in df.columns]
     print(f"✅ {label} normalized columns: {df.columns.tolist()}")
     return df
 
-def load_data():
-    load_dotenv()
-    paths = {k: os.getenv(k) for k in ["WCWQ1P1", "WCWQ1P2", "WCWQ2P1", "WCWQ2P2", "WCWQ3P1", "WCWQ3P2"]}
-    
-    for k, path in paths.items():
-        if not path or not os.path.exists(path):
-            raise FileNotFoundError(f"Missing or invalid path for {k}: {path}")
+def parse_timestamps(df, label):
+    if "timestamp" not in df.columns:
+        print(f"❌ DEBUG: Columns in {label}:", df.columns.tolist())
+        raise ValueError(f"Missing 'timestamp' column in file: {label}")
+    df["timestamp"] = parse_export_timestamps(df["timestamp"])
+    return df
+
+def ingest_file(path, label, usecols=None, engine="pandas"):
+    with stage(f"read:{label}") as record:
+        df = load_and_prepare(path, label, usecols=usecols, engine=engine)
+        record["rows"] = len(df)
+    with stage(f"parse_timestamps:{label}", rows=len(df)):
+        return parse_timestamps(df, label)
+
+def resolve_workers(max_workers=None, jobs=None):
+    if hasattr(os, "sched_getaffinity"):
+        workers = len(os.sched_getaffinity(0))
+    else:
+        workers = os.cpu_count() or 1
+    if max_workers is None and os.getenv("SALSIFY_MAX_WORKERS"):
+        max_workers = int(os.getenv("SALSIFY_MAX_WORKERS"))
+    if max_workers:
+        workers = min(workers, max_workers)
+    if jobs is not None:
+        workers = min(workers, jobs)
+    return max(workers, 1)
+
+def resolve_engine(engine):
+    if engine not in READ_ENGINES:
+        raise ValueError(f"Unknown read engine: {engine} (choose from {', '.join(READ_ENGINES)})")
+    if engine == "arrow" and not HAS_PYARROW:
+        print("⚠️ pyarrow is not installed — reading exports with the pandas parser.")
+        return "pandas"
+    return engine
+
+def ingest_files(pending, parallel=False, max_workers=None, usecols=None, engine="pandas"):
+    """Read, normalize and parse {label: path}, optionally across a process pool."""
+    if not parallel or len(pending) < 2:
+        return {label: ingest_file(path, label, usecols, engine) for label, path in pending.items()}
+
+    workers = resolve_workers(max_workers, jobs=len(pending))
+    print(f"\n🚀 Ingesting {len(pending)} files with {workers} worker processes")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {label: pool.submit(ingest_file, path, label, usecols, engine) for label, path in pending.items()}
+        return {label: future.result() for label, future in futures.items()}
+
+def load_data(use_cache=True, cache_dir=None, parallel=False, max_workers=None, compact=False, engine="pandas", dedupe=True, keep_columns=()):
+    """Combined, normalized exports; keep_columns are kept even when the compact schema would drop them."""
+    paths = get_source_paths()
+    engine = resolve_engine(engine)
+
+    if use_cache and not HAS_PYARROW:
+        print("⚠️ pyarrow is not installed — loading without the parquet cache.")
+        use_cache = False
+
+    cache_dir = get_cache_dir(cache_dir)
+    entries = load_manifest(cache_dir) if use_cache else {}
+
+    usecols = COMPACT_COLUMNS if compact else None
+    # Fingerprinting needs product and value columns the compact schema would drop
+    fingerprint_only = [col for col in FINGERPRINT_COLUMNS if col not in COMPACT_COLUMNS and col not in keep_columns] if compact and dedupe else []
+    if compact:
+        usecols = list(dict.fromkeys(COMPACT_COLUMNS + fingerprint_only + list(keep_columns)))
+
+    dfs = {}
+    pending = {}
+    for label, path in paths.items():
+        with stage(f"cache:{label}") as record:
+            cached = lookup_cached_frame(path, cache_dir, entries, usecols) if use_cache else None
+            record["rows"] = len(cached) if cached is not None else 0
+        if cached is not None:
+            print(f"⚡ {label}: Loaded {len(cached)} rows from cache")
+            dfs[label] = cached
+        else:
+            pending[label] = path
+
+    for label, frame in ingest_files(pending, parallel, max_workers, usecols, engine).items():
+        dfs[label] = frame
+        if use_cache:
+            store_cached_frame(pending[label], frame, cache_dir, entries, usecols)
+
+    if use_cache:
+        save_manifest(cache_dir, entries)
+
+    # Keep the configured source order regardless of which files came from cache
+    frames = [dfs[label] for label in paths]
+
+    if compact:
+        # Pruned columns are never read, so they are reported as a count, separately from categoricals
+        export_columns = {normalize_column_name(col) for path in paths.values() for col in read_header(path)}
+        read_columns = {col for frame in frames for col in frame.columns}
+        before = sum(memory_mb(frame) for frame in frames)
+        frames = align_categories([compact_frame(frame) for frame in frames])
+        after = sum(memory_mb(frame) for frame in frames)
+
+    # Which export each row came from, so the timestamp counts below are per file after dedupe
+    sources = np.repeat(np.arange(len(frames), dtype=np.int16), [len(frame) for frame in frames])
+    df = pd.concat(frames, ignore_index=True)
+    df["_source"] = sources
+
+    # P1/P2 exports overlap at their boundaries; count each change once
+    if dedupe:
+        with stage("dedupe", rows=len(df)):
+            df = dedupe_activity(df, label="Combined exports")
+            df = df.drop(columns=[col for col in fingerprint_only if col in df.columns])
 
-    dfs = {label: load_and_prepare(path, label) for label, path in zip(["Q1P1", "Q1P2", "Q2P1", "Q2P2", "Q3P1", "Q3P2"], paths.values())}
+    valid = df["timestamp"].notna().groupby(df.pop("_source")).agg(["sum", "size"])
+    timestamp_stats = {
+        label: {"valid": int(counts["sum"]), "invalid": int(counts["size"] - counts["sum"])}
+        for label, counts in valid.reindex(range(len(frames)), fill_value=0).set_axis(list(paths)).iterrows()
+    }
+    df.attrs["timestamp_stats"] = timestamp_stats
 
-    for label, df in dfs.items():
-        if "timestamp" not in df.columns:
-            print(f"❌ DEBUG: Columns in {label}:", df.columns.tolist())
-            raise ValueError(f"Missing 'timestamp' column in file: {label}")
-        df["timestamp"] = pd.to_datetime(df["timestamp"], format="%y-%m-%d %H:%M:%S %z", errors="coerce")
-        print(f"📅 {label}: Parsed timestamps - valid: {df['timestamp'].notna().sum()}, invalid: {df['timestamp'].isna().sum()}")
+    invalid = sum(stats["invalid"] for stats in timestamp_stats.values())
+    print(f"\n📅 Parsed timestamps (UTC) - valid: {len(df) - invalid}, invalid: {invalid}")
+    if invalid:
+        print("⚠️ Invalid timestamps by file: " + ", ".join(
+            f"{label}={stats['invalid']}" for label, stats in timestamp_stats.items() if stats["invalid"]
+        ))
 
-    df = pd.concat(dfs.values(), ignore_index=True)
+    if compact:
+        print(f"\n🗜️ Column pruning: read {len(read_columns)} of {len(export_columns)} export columns")
+        print(f"🗜️ Categoricals: {before:.1f} MB -> {after:.1f} MB (columns read, before dedupe)")
 
-    required_cols = ["property_name", "user_email", "brand", "timestamp"]
-    missing = [col for col in required_cols if col not in df.columns]
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
     if missing:
         raise ValueError(f"Missing required columns in combined dataset: {', '.join(missing)}")
 
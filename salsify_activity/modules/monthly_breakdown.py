@@ -1,5 +1,7 @@
+import calendar
+import numpy as np
 import pandas as pd
-from .write_helpers import autofit_columns
+from .write_helpers import autofit_columns, write_block
 
 # === DEFINE GROUPS ===
 PIM_TEAM = {
@@ -69,118 +71,130 @@ GROUP_COLORS = {
 }
 DEFAULT_COLOR = "#D9D9D9"
 
-def get_user_group(email):
-    if email in PIM_TEAM:
-        return "PIM Team"
-    elif email in DREAMLINE_TEAM:
-        return "Dreamline Team"
-    elif email in MAAX_TEAM:
-        return "MAAX Team"
-    else:
-        return "Other"
-
-def generate_monthly_brand_breakdowns(df, writer, brand_name=None):
-    df["month"] = df["timestamp"].dt.strftime("%b")
-    month_order = sorted(df["month"].unique(), key=lambda m: pd.to_datetime(m, format="%b").month)
+# Lookup table built once; earlier teams win if an email is listed twice
+USER_GROUPS = {
+    email: group
+    for group, team in reversed([
+        ("PIM Team", PIM_TEAM),
+        ("Dreamline Team", DREAMLINE_TEAM),
+        ("MAAX Team", MAAX_TEAM),
+    ])
+    for email in team
+}
+GROUP_RANK = {g: i for i, g in enumerate(GROUP_ORDER)}
 
-    # Infer brand from first value (assumes df is already filtered)
+def get_user_group(email):
+    return USER_GROUPS.get(email, "Other")
+
+def classify_users(emails):
+    """Vectorized get_user_group over a Series of emails."""
+    emails = pd.Series(emails)
+    if isinstance(emails.dtype, pd.CategoricalDtype):
+        # Classify the dictionary, not the rows
+        groups = pd.Index(emails.cat.categories).map(USER_GROUPS).fillna("Other").to_numpy(dtype=object)
+        codes = emails.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, groups[codes], "Other"), index=emails.index, dtype=object)
+    return emails.map(USER_GROUPS).fillna("Other")
+
+def build_monthly_tables(cube):
+    """One grouped pass over the cube -> (group_counts, user_breakdown) per month number."""
+    user_counts = (
+        cube.groupby(["month", "Group", "user_email"], observed=True)["change_count"]
+        .sum()
+        .reset_index(name="Change Count")
+    )
+    user_counts = user_counts[user_counts["Change Count"] > 0]
+    user_counts["GroupOrder"] = user_counts["Group"].map(GROUP_RANK)
+    user_counts = user_counts.sort_values(
+        by=["month", "GroupOrder", "Change Count"],
+        ascending=[True, True, False],
+        kind="stable",
+    )
+
+    group_totals = (
+        user_counts.groupby(["month", "GroupOrder", "Group"], observed=True)["Change Count"]
+        .sum()
+        .reset_index()
+    )
+
+    group_tables = {int(m): g for m, g in group_totals.groupby("month")}
+
+    tables = {}
+    for month_num, user_breakdown in user_counts.groupby("month", sort=True):
+        group_counts = group_tables[int(month_num)][["Group", "Change Count"]].reset_index(drop=True)
+        group_counts["Percentage"] = group_counts["Change Count"] / group_counts["Change Count"].sum()
+        tables[int(month_num)] = (group_counts, user_breakdown[["Group", "user_email", "Change Count"]])
+
+    return tables
+
+def generate_monthly_brand_breakdowns(cube, writer, brand_name=None):
+    # cube is an activity cube (see cube.py): month numbers, Group and change_count are precomputed
     if brand_name is None:
         chart_title_prefix = "Team"
     else:
         chart_title_prefix = f"{brand_name.capitalize()} Team"
 
-
-    for month in month_order:
-        month_df = df[df["month"] == month].copy()
-        month_df["Group"] = month_df["user_email"].apply(get_user_group)
-
-        # === GROUP SUMMARY TABLE ===
-        group_counts = (
-            month_df["Group"]
-            .value_counts()
-            .rename_axis("Group")
-            .reset_index(name="Change Count")
-        )
-        group_counts["GroupOrder"] = group_counts["Group"].map({g: i for i, g in enumerate(GROUP_ORDER)})
-        group_counts = group_counts.sort_values(by="GroupOrder").drop(columns="GroupOrder").reset_index(drop=True)
-
-        if group_counts.empty:
-            continue
-
-        # === SHEET SETUP ===
-        sheet = writer.book.add_worksheet(month)
-        header_format = writer.book.add_format({'bold': True, 'bg_color': '#D9E1F2', 'border': 1})
-        cell_format = writer.book.add_format({'border': 1})
-
-        total_changes = group_counts["Change Count"].sum()
-        group_counts["Percentage"] = group_counts["Change Count"] / total_changes
-
-        percent_format = writer.book.add_format({'num_format': '0.00%', 'border': 1})
-
-        sheet.write_row(0, 0, ["Group", "Change Count", "Percentage"], header_format)
-
-        for i, row in group_counts.iterrows():
-            sheet.write(i + 1, 0, row["Group"], cell_format)
-            sheet.write(i + 1, 1, row["Change Count"], cell_format)
-            sheet.write(i + 1, 2, row["Percentage"], percent_format)
-
-        color_points = [
-            {'fill': {'color': GROUP_COLORS.get(g, DEFAULT_COLOR)}}
-            for g in group_counts["Group"]
-        ]
-
-# === CHART INSERTION (revised portion only) ===
-
-        chart = writer.book.add_chart({'type': 'column'})
-        chart.add_series({
-            'name': f"{chart_title_prefix} Contributions - {month}",
-            'categories': [month, 1, 0, len(group_counts), 0],
-            'values':     [month, 1, 1, len(group_counts), 1],
-            'data_labels': {'value': True},
-            'points': color_points
-        })
-        chart.set_title({'name': f"{chart_title_prefix} Contributions - {month}"})
-        chart.set_x_axis({'name': 'Group'})
-        chart.set_y_axis({'name': 'Change Count'})
-        chart.set_style(10)
-        chart.set_size({'width': 600, 'height': 400})
-        sheet.insert_chart("E2", chart)
-
-        # === USER BREAKDOWN ===
-        user_breakdown = (
-            month_df.groupby(["Group", "user_email"])
-            .size()
-            .reset_index(name="Change Count")
-        )
-        user_breakdown["GroupOrder"] = user_breakdown["Group"].map({g: i for i, g in enumerate(GROUP_ORDER)})
-        user_breakdown = user_breakdown.sort_values(
-            by=["GroupOrder", "Change Count"],
-            ascending=[True, False]
-        ).drop(columns="GroupOrder")
-
-        subtotals = user_breakdown.groupby("Group")["Change Count"].sum().to_dict()
-
-        start_row = 6
-        sheet.write_row(start_row, 0, ["Group", "Email", "Change Count", "Subtotal"], header_format)
-
-        row_cursor = start_row + 1
-        previous_group = None
-
-        for _, row in user_breakdown.iterrows():
-            group = row["Group"]
-            email = row["user_email"]
-            count = row["Change Count"]
-
-            sheet.write(row_cursor, 0, group if group != previous_group else "", cell_format)
-            sheet.write(row_cursor, 1, email, cell_format)
-            sheet.write(row_cursor, 2, count, cell_format)
-
-            if group != previous_group:
-                sheet.write(row_cursor, 3, subtotals[group], cell_format)
-
-            previous_group = group
-            row_cursor += 1
-
-        display_df = user_breakdown.rename(columns={"user_email": "Email"})
-        display_df["Subtotal"] = display_df["Group"].map(subtotals)
-        autofit_columns(sheet, display_df[["Group", "Email", "Change Count", "Subtotal"]])
+    # Formats are shared by every month sheet in the workbook
+    formats = {
+        "header": writer.book.add_format({'bold': True, 'bg_color': '#D9E1F2', 'border': 1}),
+        "cell": writer.book.add_format({'border': 1}),
+        "percent": writer.book.add_format({'num_format': '0.00%', 'border': 1}),
+    }
+
+    for month_num, (group_counts, user_breakdown) in build_monthly_tables(cube).items():
+        write_month_sheet(writer, calendar.month_abbr[month_num], group_counts, user_breakdown, chart_title_prefix, formats)
+
+def write_month_sheet(writer, month, group_counts, user_breakdown, chart_title_prefix, formats):
+    # === SHEET SETUP ===
+    sheet = writer.book.add_worksheet(month)
+    header_format = formats["header"]
+    cell_format = formats["cell"]
+
+    sheet.write_row(0, 0, ["Group", "Change Count", "Percentage"], header_format)
+    write_block(sheet, 1, 0, group_counts[["Group", "Change Count", "Percentage"]], {
+        "Group": cell_format,
+        "Change Count": cell_format,
+        "Percentage": formats["percent"],
+    })
+
+    color_points = [
+        {'fill': {'color': GROUP_COLORS.get(g, DEFAULT_COLOR)}}
+        for g in group_counts["Group"]
+    ]
+
+    # === CHART INSERTION ===
+
+    chart = writer.book.add_chart({'type': 'column'})
+    chart.add_series({
+        'name': f"{chart_title_prefix} Contributions - {month}",
+        'categories': [month, 1, 0, len(group_counts), 0],
+        'values':     [month, 1, 1, len(group_counts), 1],
+        'data_labels': {'value': True},
+        'points': color_points
+    })
+    chart.set_title({'name': f"{chart_title_prefix} Contributions - {month}"})
+    chart.set_x_axis({'name': 'Group'})
+    chart.set_y_axis({'name': 'Change Count'})
+    chart.set_style(10)
+    chart.set_size({'width': 600, 'height': 400})
+    sheet.insert_chart("E2", chart)
+
+    # === USER BREAKDOWN ===
+    subtotals = group_counts.set_index("Group")["Change Count"].to_dict()
+
+    start_row = 6
+    sheet.write_row(start_row, 0, ["Group", "Email", "Change Count", "Subtotal"], header_format)
+
+    # Group label and subtotal only on the first row of each group
+    first_in_group = user_breakdown["Group"].ne(user_breakdown["Group"].shift()).to_numpy()
+    block = pd.DataFrame({
+        "Group": user_breakdown["Group"].where(first_in_group, ""),
+        "Email": user_breakdown["user_email"],
+        "Change Count": user_breakdown["Change Count"],
+        "Subtotal": user_breakdown["Group"].map(subtotals).where(first_in_group),
+    })
+    write_block(sheet, start_row + 1, 0, block, {col: cell_format for col in block.columns}, skip_missing=True)
+
+    display_df = user_breakdown.rename(columns={"user_email": "Email"})
+    display_df["Subtotal"] = display_df["Group"].map(subtotals)
+    autofit_columns(sheet, display_df[["Group", "Email", "Change Count", "Subtotal"]])
@@ -0,0 +1,62 @@
+# === preflight.py ===
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from .load_data import get_source_paths, resolve_workers
+from .schema import REQUIRED_COLUMNS, normalize_column_name
+from .timestamps import parse_export_timestamps
+
+# Rows read from the top of each export to check the timestamp format
+PREFLIGHT_SAMPLE_ROWS = 200
+
+def inspect_export(label, path, sample_rows=PREFLIGHT_SAMPLE_ROWS):
+    """Read the header and first rows of one export and report what a full load would trip over."""
+    result = {"label": label, "path": path, "columns": [], "missing": [], "sampled": 0, "invalid_timestamps": 0, "error": None}
+    try:
+        sample = pd.read_csv(path, nrows=sample_rows, dtype=str)
+    except Exception as e:
+        result["error"] = f"unreadable: {e}"
+        return result
+
+    result["columns"] = sample.columns.tolist()
+    sample.columns = [normalize_column_name(col) for col in sample.columns]
+    result["missing"] = [col for col in REQUIRED_COLUMNS if col not in sample.columns]
+
+    if "timestamp" in sample.columns:
+        stamps = sample["timestamp"].dropna()
+        parsed = parse_export_timestamps(stamps)
+        result["sampled"] = len(stamps)
+        result["invalid_timestamps"] = int(parsed.isna().sum())
+        if len(stamps) and result["invalid_timestamps"] == len(stamps):
+            result["error"] = f"no timestamp in the first {len(stamps)} rows matches 'yy-mm-dd HH:MM:SS +hhmm' (e.g. {stamps.iloc[0]!r})"
+
+    if result["missing"]:
+        result["error"] = f"missing required columns: {', '.join(result['missing'])}"
+    return result
+
+def inspect_exports(paths=None, sample_rows=PREFLIGHT_SAMPLE_ROWS, max_workers=None):
+    """inspect_export() for every configured export concurrently; {label: result}, never raises."""
+    paths = paths or get_source_paths()
+    workers = resolve_workers(max_workers, jobs=len(paths))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {label: pool.submit(inspect_export, label, path, sample_rows) for label, path in paths.items()}
+        return {label: future.result() for label, future in futures.items()}
+
+def preflight_failures(results):
+    return [f"{label} ({result['path']}): {result['error']}" for label, result in results.items() if result["error"]]
+
+def preflight_exports(paths=None, sample_rows=PREFLIGHT_SAMPLE_ROWS, max_workers=None):
+    """Check every configured export concurrently; raise before any full read if one can't be loaded."""
+    start = time.perf_counter()
+    results = inspect_exports(paths, sample_rows, max_workers)
+
+    for label, result in results.items():
+        if result["invalid_timestamps"] and not result["error"]:
+            print(f"⚠️ {label}: {result['invalid_timestamps']} of {result['sampled']} sampled timestamps are malformed")
+
+    failures = preflight_failures(results)
+    if failures:
+        raise ValueError("Pre-flight check failed:\n  " + "\n  ".join(failures))
+
+    print(f"🛫 Pre-flight OK: {len(results)} exports checked in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return results
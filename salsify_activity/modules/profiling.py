@@ -0,0 +1,175 @@
+# === profiling.py ===
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where the platform can't report it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+def current_rss_mb():
+    """Current resident set size in MB (Linux /proc, else psutil if installed), or None."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss / 1024 ** 2
+
+class RssSampler:
+    """Poll RSS on a background thread to find the peak while a block of code runs."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.baseline = None
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = current_rss_mb()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.baseline = current_rss_mb()
+        self.peak = self.baseline
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        rss = current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+        return False
+
+    @property
+    def peak_delta(self):
+        if self.peak is None or self.baseline is None:
+            return None
+        return self.peak - self.baseline
+
+# === Stage instrumentation ===
+# Code marks its stages with `with stage(...)`; they are recorded only while a
+# StageRecorder is active, so library calls outside main.py cost nothing extra.
+
+_active_recorder = None
+
+class StageRecorder:
+    def __init__(self):
+        self.stages = []
+        self._stack = []
+
+    def __enter__(self):
+        global _active_recorder
+        self._previous = _active_recorder
+        _active_recorder = self
+        return self
+
+    def __exit__(self, *exc):
+        global _active_recorder
+        _active_recorder = self._previous
+        return False
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        path = "/".join(self._stack + [name])
+        self._stack.append(name)
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        record = {"stage": path, "rows": rows}
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            rss_after = current_rss_mb()
+            self._stack.pop()
+            record["seconds"] = round(seconds, 4)
+            if record["rows"] is not None and seconds:
+                record["rows_per_sec"] = round(record["rows"] / seconds)
+            if rss_before is not None and rss_after is not None:
+                record["rss_delta_mb"] = round(rss_after - rss_before, 1)
+            self.stages.append(record)
+
+    def write_report(self, path, **extra):
+        peak = peak_rss_mb()
+        report = {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "peak_rss_mb": round(peak, 1) if peak is not None else None,
+            **extra,
+            "stages": self.stages,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+        return path
+
+@contextmanager
+def stage(name, rows=None):
+    """Record a timed stage on the active recorder; set record["rows"] inside the block if only known afterwards."""
+    if _active_recorder is None:
+        yield {}
+        return
+    with _active_recorder.stage(name, rows) as record:
+        yield record
+
+@contextmanager
+def profile_run(mode, output_base):
+    """Wrap the run in cProfile or pyinstrument and write <output_base>.prof / .html."""
+    if mode is None:
+        yield None
+        return
+
+    if mode == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{output_base}.prof")
+            print(f"🔬 cProfile stats written: {output_base}.prof")
+        return
+
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("⚠️ pyinstrument is not installed — running without a profiler")
+            yield None
+            return
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            with open(f"{output_base}.html", "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+            print(f"🔬 pyinstrument report written: {output_base}.html")
+        return
+
+    raise ValueError(f"Unknown profiler: {mode}")
@@ -0,0 +1,108 @@
+# === query.py ===
+import glob
+import os
+from .cache import get_cache_dir, load_manifest
+from .incremental import get_store_dir, ACTIVITY_DIR
+from .dedupe import FINGERPRINT_COLUMNS
+
+try:
+    import duckdb
+    HAS_DUCKDB = True
+except ImportError:
+    HAS_DUCKDB = False
+
+# Columns callers may group or filter on through group_counts()
+QUERY_COLUMNS = ["date", "month", "brand", "property_name", "user_email", "timestamp"]
+
+def history_files(source="cache", cache_dir=None, store_dir=None):
+    """Parquet files holding the activity history: the load cache or the incremental store."""
+    if source == "cache":
+        cache_dir = get_cache_dir(cache_dir)
+        files = [os.path.join(cache_dir, entry["parquet"]) for entry in load_manifest(cache_dir).values()]
+    elif source == "store":
+        files = sorted(glob.glob(os.path.join(get_store_dir(store_dir), ACTIVITY_DIR, "*.parquet")))
+    else:
+        raise ValueError(f"Unknown history source: {source}")
+
+    files = [f for f in files if os.path.exists(f)]
+    if not files:
+        raise FileNotFoundError(f"No parquet history found in the {source} — run main.py first")
+    return files
+
+def dedupe_clause(columns):
+    """QUALIFY keeping the first row (in file order) per FINGERPRINT_COLUMNS, as load_data's dedupe does."""
+    # Same text as schema.canonical_text: a float-read ID 593.0 matches 593 and "593"
+    keys = [
+        col if col == "timestamp" else rf"regexp_replace(CAST({col} AS VARCHAR), '^(-?\d+)\.0$', '\1')"
+        for col in FINGERPRINT_COLUMNS if col in columns
+    ]
+    return f"QUALIFY row_number() OVER (PARTITION BY {', '.join(keys)} ORDER BY file_index, file_row_number) = 1"
+
+def connect(source="cache", cache_dir=None, store_dir=None, dedupe=True):
+    """DuckDB connection with an `activity` view over the parquet history (UTC, brands normalized).
+
+    The cache holds the exports as read, so with dedupe rows repeated across overlapping
+    exports are dropped in the view, matching the workbooks. The store is deduped already.
+    """
+    if not HAS_DUCKDB:
+        raise ImportError("duckdb is required for the query layer: pip install duckdb")
+
+    files = history_files(source, cache_dir, store_dir)
+    con = duckdb.connect()
+    con.execute("SET TimeZone = 'UTC'")
+    file_list = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+    history = f"read_parquet([{file_list}], union_by_name = true, filename = true, file_row_number = true)"
+    columns = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {history}").fetchall()]
+    qualify = dedupe_clause(columns) if dedupe and source == "cache" else ""
+    con.execute(f"""
+        CREATE VIEW activity AS
+        SELECT
+            * EXCLUDE (filename, file_row_number, file_index) REPLACE (lower(trim(brand)) AS brand),
+            CAST(timestamp AS DATE) AS date,
+            strftime(timestamp, '%Y-%m') AS month
+        FROM (
+            SELECT *, list_position([{file_list}], filename) AS file_index
+            FROM {history}
+        )
+        {qualify}
+    """)
+    return con
+
+def run_sql(sql, con=None, **connect_kwargs):
+    con = con or connect(**connect_kwargs)
+    return con.execute(sql).df()
+
+def group_counts(by, brand=None, property_name=None, user=None, since=None, until=None, limit=None, con=None, **connect_kwargs):
+    """Change counts grouped by `by` with optional filters; since/until are inclusive dates (UTC)."""
+    by = [by] if isinstance(by, str) else list(by)
+    unknown = [col for col in by if col not in QUERY_COLUMNS]
+    if unknown:
+        raise ValueError(f"Cannot group by {', '.join(unknown)}; choose from {', '.join(QUERY_COLUMNS)}")
+
+    clauses, params = [], []
+    if brand:
+        clauses.append("brand = ?")
+        params.append(brand.strip().lower())
+    if property_name:
+        clauses.append("property_name = ?")
+        params.append(property_name)
+    if user:
+        clauses.append("user_email = ?")
+        params.append(user)
+    if since:
+        clauses.append("date >= CAST(? AS DATE)")
+        params.append(str(since))
+    if until:
+        clauses.append("date <= CAST(? AS DATE)")
+        params.append(str(until))
+
+    cols = ", ".join(by)
+    sql = f"SELECT {cols}, count(*) AS change_count FROM activity"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" GROUP BY {cols} ORDER BY change_count DESC, {cols}"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+
+    con = con or connect(**connect_kwargs)
+    return con.execute(sql, params).df()
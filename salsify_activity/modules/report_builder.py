@@ -1,58 +1,253 @@
 # === report_builder.py ===
+import os
+import time
 import pandas as pd
-from .charts import insert_summary_chart, insert_changes_over_time_sheet
-from .write_helpers import write_breakdown_table, autofit_columns
+from concurrent.futures import ProcessPoolExecutor
+from .charts import insert_summary_chart, insert_changes_over_time_sheet, insert_rolling_activity_sheet
+from .write_helpers import write_breakdown_table, write_table_sheet, autofit_columns
 from .monthly_breakdown import generate_monthly_brand_breakdowns
+from .cube import (
+    build_activity_cube,
+    cube_daily_counts,
+    cube_top_properties,
+    cube_all_users,
+    cube_top_brands,
+    cube_breakdowns,
+)
+from .rolling import rolling_activity
+from .load_data import resolve_workers
+from .shared_dataset import resolve_frame
+from .profiling import stage
 
-def build_excel_report(df, top_fields, all_users, top_brands, brand_user_df, property_user_df, output_filename="report.xlsx", brand_name=None):
-    with pd.ExcelWriter(output_filename, engine="xlsxwriter") as writer:
+# Excel's hard row limit, less the header
+RAW_SHEET_MAX_ROWS = 1_048_575
+ROLLING_SHEET_MAX_ROWS = RAW_SHEET_MAX_ROWS
+RAW_SHEET_COLUMNS = ["timestamp", "user_email", "brand", "property_name"]
 
-        # 1. Changes Over Time
-        insert_changes_over_time_sheet(writer, df)
-        from_date = df["timestamp"].dt.date.min()
-        to_date = df["timestamp"].dt.date.max()
-        daily_counts = df["timestamp"].dt.date.value_counts().sort_index().reset_index(name="change_count")
-        daily_counts.columns = ["date", "change_count"]
-        autofit_columns(writer.sheets["Changes Over Time"], daily_counts)
+# Selectable sheets in workbook order: --sheets / SALSIFY_SHEETS name -> sheet written
+REPORT_SHEETS = {
+    "changes": "Changes Over Time",
+    "rolling": "Rolling Activity",
+    "users": "All Users",
+    "brands": "Top Brands",
+    "brand-users": "Brand_User_Breakdown",
+    "properties": "Top Properties",
+    "property-users": "Property_User_Breakdown",
+    "monthly": "per-month tabs",
+}
 
-        # 2. All Users
-        all_users.to_excel(writer, sheet_name="All Users", index=False)
-        autofit_columns(writer.sheets["All Users"], all_users)
+# Summary data sheets that back the charts and are hidden once written
+HIDDEN_SHEETS = ["All Users", "Top Brands", "Brand_User_Breakdown", "Top Properties", "Property_User_Breakdown"]
 
-        # 3. Top Brands
-        top_brands.to_excel(writer, sheet_name="Top Brands", index=False)
-        autofit_columns(writer.sheets["Top Brands"], top_brands)
+def resolve_sheets(sheets=None):
+    """Validate a sheet selection; None means SALSIFY_SHEETS (comma-separated) or every sheet."""
+    if sheets is None and os.getenv("SALSIFY_SHEETS"):
+        sheets = [name.strip() for name in os.getenv("SALSIFY_SHEETS").split(",") if name.strip()]
+    if not sheets:
+        return list(REPORT_SHEETS)
 
-        # 4. Brand_User_Breakdown
-        brand_ws = writer.book.add_worksheet("Brand_User_Breakdown")
-        write_breakdown_table(brand_ws, brand_user_df, "brand")
+    unknown = [name for name in sheets if name not in REPORT_SHEETS]
+    if unknown:
+        raise ValueError(f"Unknown sheets: {', '.join(unknown)} (choose from {', '.join(REPORT_SHEETS)})")
+    return [name for name in REPORT_SHEETS if name in sheets]
 
-        # 5. Top Properties
-        top_fields.to_excel(writer, sheet_name="Top Properties", index=False)
-        autofit_columns(writer.sheets["Top Properties"], top_fields)
+def write_summary_sheet(writer, frame, sheet_name, constant_memory=False):
+    if constant_memory:
+        write_table_sheet(writer, frame, sheet_name)
+    else:
+        frame.to_excel(writer, sheet_name=sheet_name, index=False)
+    autofit_columns(writer.sheets[sheet_name], frame)
 
-        # 6. Property_User_Breakdown
-        property_ws = writer.book.add_worksheet("Property_User_Breakdown")
-        write_breakdown_table(property_ws, property_user_df, "property_name")
+def write_raw_activity_sheet(writer, df, constant_memory=False):
+    raw = df[[col for col in RAW_SHEET_COLUMNS if col in df.columns]]
+    if len(raw) > RAW_SHEET_MAX_ROWS:
+        print(f"⚠️ Raw Activity sheet truncated to {RAW_SHEET_MAX_ROWS} of {len(raw)} rows")
+        raw = raw.head(RAW_SHEET_MAX_ROWS)
 
-        # 7. Monthly breakdowns (adds sheets and charts)
-        generate_monthly_brand_breakdowns(df, writer, brand_name=brand_name)
+    raw = raw.copy()
+    # Excel has no timezone support; timestamps are written as UTC wall time
+    raw["timestamp"] = raw["timestamp"].dt.tz_localize(None)
+    for col in raw.columns.drop("timestamp"):
+        raw[col] = raw[col].astype(object)
 
-        # Insert summary charts
+    if constant_memory:
+        ts_format = writer.book.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+        write_table_sheet(writer, raw, "Raw Activity", {"timestamp": ts_format})
+    else:
+        raw.to_excel(writer, sheet_name="Raw Activity", index=False)
+    autofit_columns(writer.sheets["Raw Activity"], raw)
+
+def build_distinct_products_report(summaries, output_filename, constant_memory=False):
+    """Write generate_distinct_summaries() output: one sheet per rollup (user, brand, month)."""
+    engine_kwargs = {"options": {"constant_memory": True}} if constant_memory else None
+    with pd.ExcelWriter(output_filename, engine="xlsxwriter", engine_kwargs=engine_kwargs) as writer:
+        for scope, frame in summaries.items():
+            write_summary_sheet(writer, frame, f"By {scope.title()}", constant_memory)
+    print(f"✅ Distinct products report generated: {output_filename}")
+
+def build_excel_report(df, top_fields, all_users, top_brands, brand_user_df, property_user_df, output_filename="report.xlsx", brand_name=None, cube=None, constant_memory=False, raw_sheet=False, sheets=None):
+    # Pass a prebuilt cube (df may then be None) to skip re-aggregating the raw rows
+    if cube is None:
+        cube = build_activity_cube(df)
+    sheets = resolve_sheets(sheets)
+
+    # constant_memory flushes each row to disk as soon as a later row is written,
+    # so every sheet below must be written strictly top to bottom
+    engine_kwargs = {"options": {"constant_memory": True}} if constant_memory else None
+
+    writer = pd.ExcelWriter(output_filename, engine="xlsxwriter", engine_kwargs=engine_kwargs)
+    try:
+        write_report_sheets(
+            writer, df, cube, top_fields, all_users, top_brands, brand_user_df, property_user_df,
+            brand_name, constant_memory, raw_sheet, sheets,
+        )
+    except Exception:
+        writer.close()
+        raise
+
+    with stage("close"):
+        writer.close()
+
+    print(f"✅ Excel report generated: {output_filename}")
+
+def write_report_sheets(writer, df, cube, top_fields, all_users, top_brands, brand_user_df, property_user_df, brand_name, constant_memory, raw_sheet, sheets):
+    # 1. Changes Over Time
+    if "changes" in sheets:
+        with stage("sheet:Changes Over Time") as record:
+            daily_counts = cube_daily_counts(cube)
+            insert_changes_over_time_sheet(writer, daily_counts, constant_memory=constant_memory)
+            autofit_columns(writer.sheets["Changes Over Time"], daily_counts)
+            record["rows"] = len(daily_counts)
+
+    # 1b. Rolling 7/30/90-day counts overall, per brand and per user
+    if "rolling" in sheets:
+        with stage("sheet:Rolling Activity") as record:
+            rolling = rolling_activity(cube, max_rows=ROLLING_SHEET_MAX_ROWS)
+            insert_rolling_activity_sheet(writer, rolling, constant_memory=constant_memory)
+            autofit_columns(writer.sheets["Rolling Activity"], rolling)
+            record["rows"] = len(rolling)
+
+    # 2. All Users
+    if "users" in sheets:
+        with stage("sheet:All Users", rows=len(all_users)):
+            write_summary_sheet(writer, all_users, "All Users", constant_memory)
+
+    # 3. Top Brands
+    if "brands" in sheets:
+        with stage("sheet:Top Brands", rows=len(top_brands)):
+            write_summary_sheet(writer, top_brands, "Top Brands", constant_memory)
+
+    # 4. Brand_User_Breakdown
+    if "brand-users" in sheets:
+        with stage("sheet:Brand_User_Breakdown", rows=len(brand_user_df)):
+            brand_ws = writer.book.add_worksheet("Brand_User_Breakdown")
+            write_breakdown_table(brand_ws, brand_user_df, "brand")
+
+    # 5. Top Properties
+    if "properties" in sheets:
+        with stage("sheet:Top Properties", rows=len(top_fields)):
+            write_summary_sheet(writer, top_fields, "Top Properties", constant_memory)
+
+    # 6. Property_User_Breakdown
+    if "property-users" in sheets:
+        with stage("sheet:Property_User_Breakdown", rows=len(property_user_df)):
+            property_ws = writer.book.add_worksheet("Property_User_Breakdown")
+            write_breakdown_table(property_ws, property_user_df, "property_name")
+
+    # 7. Monthly breakdowns (adds sheets and charts)
+    if "monthly" in sheets:
+        with stage("sheets:monthly", rows=len(cube)):
+            generate_monthly_brand_breakdowns(cube, writer, brand_name=brand_name)
+
+    # 8. Optional raw rows (needs the raw frame, not just the cube)
+    if raw_sheet:
+        if df is None:
+            print("⚠️ Skipping 'Raw Activity' sheet: no raw rows available for this report")
+        else:
+            with stage("sheet:Raw Activity", rows=len(df)):
+                write_raw_activity_sheet(writer, df, constant_memory)
+
+    # Insert summary charts
+    with stage("charts"):
         wb = writer.book
-        insert_summary_chart(wb, writer.sheets["Top Properties"], "Top 50 Properties Changed", 0, 1, len(top_fields))
-        insert_summary_chart(wb, writer.sheets["All Users"], "Top 10 Users by Changes", 0, 1, min(10, len(all_users)))
-        insert_summary_chart(wb, writer.sheets["Top Brands"], "Top 50 Brands Changed", 0, 1, len(top_brands))
-
-        # Hide raw data sheets
-        for sheet_name in [
-            "All Users",
-            "Top Brands",
-            "Brand_User_Breakdown",
-            "Top Properties",
-            "Property_User_Breakdown"
-        ]:
+        if "properties" in sheets:
+            insert_summary_chart(wb, writer.sheets["Top Properties"], "Top 50 Properties Changed", 0, 1, len(top_fields))
+        if "users" in sheets:
+            insert_summary_chart(wb, writer.sheets["All Users"], "Top 10 Users by Changes", 0, 1, min(10, len(all_users)))
+        if "brands" in sheets:
+            insert_summary_chart(wb, writer.sheets["Top Brands"], "Top 50 Brands Changed", 0, 1, len(top_brands))
+
+    # Hide raw data sheets, as long as something visible is left in the workbook
+    if any(sheet_name not in HIDDEN_SHEETS for sheet_name in writer.sheets):
+        for sheet_name in HIDDEN_SHEETS:
             if sheet_name in writer.sheets:
                 writer.sheets[sheet_name].hidden = True
 
-    print(f"✅ Excel report generated: {output_filename}")
+        # Excel won't open on a hidden sheet
+        worksheets = writer.book.worksheets()
+        if worksheets[0].hidden:
+            next(ws for ws in worksheets if not ws.hidden).activate()
+
+
+def build_report_from_cube(cube, output_filename, brand_name=None, raw_df=None, constant_memory=False, sheets=None):
+    """Summarize a cube slice and write its workbook; returns wall time in seconds.
+
+    Only the aggregations behind the selected sheets are computed. cube and raw_df may be
+    SharedFrame handles, which are mapped and sliced here in the worker.
+    """
+    start = time.perf_counter()
+    sheets = resolve_sheets(sheets)
+    with stage("shared:load"):
+        cube, raw_df = resolve_frame(cube), resolve_frame(raw_df)
+
+    with stage("summaries", rows=len(cube)):
+        top_fields = cube_top_properties(cube) if {"properties", "property-users"} & set(sheets) else None
+        all_users = cube_all_users(cube) if "users" in sheets else None
+        top_brands = cube_top_brands(cube) if {"brands", "brand-users"} & set(sheets) else None
+    with stage("breakdowns", rows=len(cube)):
+        brand_user_df = cube_breakdowns(cube, top_brands, "brand") if "brand-users" in sheets else None
+        property_user_df = cube_breakdowns(cube, top_fields, "property_name") if "property-users" in sheets else None
+
+    build_excel_report(
+        df=raw_df,
+        cube=cube,
+        top_fields=top_fields,
+        all_users=all_users,
+        top_brands=top_brands,
+        brand_user_df=brand_user_df,
+        property_user_df=property_user_df,
+        output_filename=output_filename,
+        brand_name=brand_name,
+        constant_memory=constant_memory,
+        raw_sheet=raw_df is not None,
+        sheets=sheets,
+    )
+    return time.perf_counter() - start
+
+def build_reports(jobs, parallel=False, max_workers=None, constant_memory=False, sheets=None):
+    """Render [(cube, output_filename, raw_df), ...], each workbook in its own worker process when parallel.
+
+    raw_df is None unless the workbook should carry a Raw Activity sheet. For the parallel
+    path pass SharedFrame handles (see shared_dataset.shared_frames) so each worker maps
+    one Arrow file instead of unpickling its own copy of the rows.
+    """
+    sheets = resolve_sheets(sheets)
+    if not parallel or len(jobs) < 2:
+        timings = {}
+        for cube, filename, raw_df in jobs:
+            with stage(f"report:{filename}"):
+                timings[filename] = build_report_from_cube(cube, filename, raw_df=raw_df, constant_memory=constant_memory, sheets=sheets)
+    else:
+        workers = resolve_workers(max_workers, jobs=len(jobs))
+        print(f"🚀 Rendering {len(jobs)} workbooks with {workers} worker processes")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                filename: pool.submit(build_report_from_cube, cube, filename, None, raw_df, constant_memory, sheets)
+                for cube, filename, raw_df in jobs
+            }
+            with stage("reports:parallel", rows=len(jobs)):
+                timings = {filename: future.result() for filename, future in futures.items()}
+
+    for filename, seconds in timings.items():
+        print(f"⏱️ {filename}: {seconds:.2f}s")
+    return timings
@@ -0,0 +1,102 @@
+# === rolling.py ===
+import numpy as np
+import pandas as pd
+from .cube import sum_by
+
+ROLLING_WINDOWS = (7, 30, 90)
+
+# scope label -> cube column the rolling counts are split by (None = all activity)
+ROLLING_SCOPES = {"all": None, "brand": "brand", "user": "user_email"}
+
+# Scopes trimmed, in this order, when the sheet would pass its row cap
+ROLLING_TRIM_SCOPES = ("user", "brand")
+
+def daily_matrix(cube, key=None):
+    """Daily change counts as a dense calendar-day × key matrix (missing days are 0)."""
+    dated = cube.dropna(subset=["date"])
+    if key is None:
+        daily = sum_by(dated, "date").to_frame("all")
+    else:
+        daily = sum_by(dated, ["date", key]).unstack(key, fill_value=0)
+        daily.columns = daily.columns.astype(object)
+
+    if daily.empty:
+        return daily
+    days = pd.date_range(daily.index.min(), daily.index.max(), freq="D")
+    return daily.reindex(days, fill_value=0)
+
+def rolling_sums(matrix, windows=ROLLING_WINDOWS):
+    """Trailing-window sums for every column of a daily matrix.
+
+    Each window slides one day at a time: add the new day, drop the day that fell out.
+    Running totals turn that into a single subtraction per cell, so the cost does not
+    grow with the window length.
+    """
+    values = matrix.to_numpy(dtype=np.int64)
+    running = np.cumsum(values, axis=0)
+
+    sums = {}
+    for window in windows:
+        totals = running.copy()
+        totals[window:] -= running[:-window]
+        sums[window] = totals
+    return sums
+
+def cap_rolling_rows(rolling, max_rows, windows=ROLLING_WINDOWS):
+    """Fit rolling_activity() output into max_rows by keeping only the most active names.
+
+    Users are trimmed first, then brands; whole names are dropped, least active first
+    (by summed changes_<shortest window>d), so every kept name keeps its full history.
+    """
+    if len(rolling) <= max_rows:
+        return rolling
+
+    activity_col = f"changes_{min(windows)}d"
+    for scope in ROLLING_TRIM_SCOPES:
+        if len(rolling) <= max_rows:
+            break
+        in_scope = (rolling["scope"] == scope).to_numpy()
+        budget = max_rows - int((~in_scope).sum())
+
+        scoped = rolling[in_scope]
+        per_name = scoped.groupby("name", sort=False).agg(rows=("name", "size"), activity=(activity_col, "sum"))
+        per_name = per_name.sort_values("activity", ascending=False, kind="stable")
+        keep = per_name.index[per_name["rows"].cumsum().to_numpy() <= max(budget, 0)]
+
+        print(f"⚠️ Rolling Activity sheet over {max_rows} rows: kept the {len(keep)} most active of {len(per_name)} {scope} names")
+        rolling = rolling[~in_scope | rolling["name"].isin(keep).to_numpy()]
+
+    if len(rolling) > max_rows:
+        print(f"⚠️ Rolling Activity sheet truncated to {max_rows} of {len(rolling)} rows")
+        rolling = rolling.head(max_rows)
+    return rolling.reset_index(drop=True)
+
+def rolling_activity(cube, windows=ROLLING_WINDOWS, max_rows=None):
+    """Long-form rolling change counts: date, scope (all/brand/user), name, changes_<n>d per window.
+
+    Rows where every window is zero are dropped so idle users don't fill the sheet.
+    With max_rows, the least active users (then brands) are left out to fit; see cap_rolling_rows().
+    """
+    frames = []
+    for scope, key in ROLLING_SCOPES.items():
+        matrix = daily_matrix(cube, key)
+        if matrix.empty:
+            continue
+        sums = rolling_sums(matrix, windows)
+
+        frame = pd.DataFrame({
+            "date": np.repeat(matrix.index.date, matrix.shape[1]),
+            "scope": scope,
+            "name": np.tile(matrix.columns.to_numpy(dtype=object), len(matrix)),
+        })
+        for window in windows:
+            frame[f"changes_{window}d"] = sums[window].ravel()
+
+        window_cols = [f"changes_{window}d" for window in windows]
+        frame = frame[frame[window_cols].to_numpy().any(axis=1)]
+        frames.append(frame.sort_values(["name", "date"], kind="stable") if key else frame)
+
+    if not frames:
+        return pd.DataFrame(columns=["date", "scope", "name"] + [f"changes_{window}d" for window in windows])
+    rolling = pd.concat(frames, ignore_index=True)
+    return cap_rolling_rows(rolling, max_rows, windows) if max_rows is not None else rolling
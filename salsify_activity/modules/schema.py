@@ -0,0 +1,93 @@
+# === schema.py ===
+import numpy as np
+import pandas as pd
+
+REQUIRED_COLUMNS = ["property_name", "user_email", "brand", "timestamp"]
+
+# Columns the reports actually read; everything else is dropped in compact mode
+COMPACT_COLUMNS = REQUIRED_COLUMNS
+
+# Always stored as categoricals in compact mode
+CATEGORICAL_COLUMNS = ["brand", "user_email", "property_name"]
+
+# Other string columns become categoricals when they repeat at least this much
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+def normalize_column_name(name):
+    return str(name).strip().lower().replace(" ", "_")
+
+def canonical_text(values):
+    """Object array of a column as text for hashing, the same whichever dtype the reader inferred.
+
+    Integral floats print as integers, so a Product ID read as 593.0 (float column, because
+    of a blank elsewhere), as 593 (int column) or as "593" (string read) gives the same text.
+    Missing values are NaN.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = canonical_text(pd.Series(values.cat.categories))
+        codes = values.cat.codes.to_numpy()
+        return np.append(categories, np.nan).astype(object)[codes]
+
+    missing = values.isna().to_numpy()
+    if values.dtype.kind == "f":
+        numbers = values.to_numpy(dtype=np.float64)
+        text = values.astype(str).to_numpy(dtype=object)
+        # float64 is exact for integers up to 2**53
+        integral = ~missing & np.isfinite(numbers) & (np.floor(numbers) == numbers) & (np.abs(numbers) < 2 ** 53)
+        text[integral] = numbers[integral].astype(np.int64).astype(str).astype(object)
+    elif values.dtype == object:
+        text = values.to_numpy(dtype=object).copy()
+        # Plain text columns (the usual case) skip the per-value type check
+        if pd.api.types.infer_dtype(values, skipna=True) not in ("string", "empty"):
+            numeric = ~missing & np.array([isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in text], dtype=bool)
+            if numeric.any():
+                text[numeric] = canonical_text(pd.Series(text[numeric].astype(np.float64)))
+    else:
+        text = values.astype(str).to_numpy(dtype=object)
+    text[missing] = np.nan
+    return text
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+def compact_frame(df):
+    for col in df.columns:
+        if col in CATEGORICAL_COLUMNS:
+            df[col] = df[col].astype("category")
+        elif df[col].dtype == object and len(df):
+            if df[col].nunique(dropna=True) / len(df) <= CATEGORY_MAX_UNIQUE_RATIO:
+                df[col] = df[col].astype("category")
+    return df
+
+def align_categories(frames):
+    """Give every frame the same category dictionary per column so pd.concat keeps them categorical."""
+    cat_cols = set()
+    for frame in frames:
+        cat_cols.update(c for c in frame.columns if isinstance(frame[c].dtype, pd.CategoricalDtype))
+
+    for col in cat_cols:
+        parts = [frame[col] for frame in frames if col in frame.columns]
+        categories = pd.Index(
+            pd.unique(np.concatenate([
+                np.asarray(p.cat.categories if isinstance(p.dtype, pd.CategoricalDtype) else p.dropna().unique(), dtype=object)
+                for p in parts
+            ]))
+        )
+        for frame in frames:
+            if col in frame.columns:
+                frame[col] = frame[col].astype(pd.CategoricalDtype(categories))
+    return frames
+
+def normalize_brands(df):
+    brand = df["brand"]
+    if isinstance(brand.dtype, pd.CategoricalDtype):
+        # Normalize the dictionary once instead of every row, merging labels that collide
+        normalized = brand.cat.categories.astype(str).str.strip().str.lower()
+        new_categories = pd.Index(normalized.unique())
+        remap = new_categories.get_indexer(normalized)
+        codes = brand.cat.codes.to_numpy()
+        new_codes = np.where(codes >= 0, remap[codes], -1)
+        df["brand"] = pd.Categorical.from_codes(new_codes, new_categories)
+    else:
+        df["brand"] = brand.str.strip().str.lower()
+    return df
@@ -0,0 +1,134 @@
+# === shared_dataset.py ===
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from .profiling import stage
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# RAM-backed on Linux, so mapping the file never touches disk. Containers often mount a
+# small /dev/shm (64 MB), so the temp directory is the fallback; a mapped file there is
+# shared through the page cache just the same
+DEFAULT_SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+def shared_dir_candidates(shared_dir=None):
+    """Directories to try in order; an explicit dir or SALSIFY_SHARED_DIR is used alone."""
+    explicit = shared_dir or os.getenv("SALSIFY_SHARED_DIR")
+    if explicit:
+        return [explicit]
+    return [d for d in (DEFAULT_SHARED_DIR, tempfile.gettempdir()) if d]
+
+def has_room(directory, nbytes):
+    try:
+        return shutil.disk_usage(directory).free > nbytes
+    except OSError:
+        return False
+
+def write_ipc(df, path):
+    """Write df (or an Arrow table) as an uncompressed Arrow IPC file; dtypes (UTC timestamps, categoricals, Int8) round-trip."""
+    table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = path + ".tmp"
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return path
+
+def write_shared_file(name, df, shared_dir=None):
+    """Write df to the first candidate directory with room for it; returns the file path."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    candidates = shared_dir_candidates(shared_dir)
+    for i, directory in enumerate(candidates):
+        last = i == len(candidates) - 1
+        # IPC adds a little framing on top of the buffers
+        if not last and not has_room(directory, table.nbytes * 1.1 + (1 << 20)):
+            continue
+        path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, path = tempfile.mkstemp(prefix=f"salsify-{name}-", suffix=".arrow", dir=directory)
+            os.close(fd)
+            return write_ipc(table, path)
+        except OSError as e:
+            if path and os.path.exists(path):
+                os.remove(path)
+            if last:
+                raise
+            print(f"⚠️ Could not write shared {name} to {directory} ({e}); trying {candidates[i + 1]}")
+
+def open_ipc(path):
+    """Arrow table whose buffers point straight into the memory-mapped file (no read, no copy)."""
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+def filter_mask(table, filters):
+    """AND across columns; a list of values for one column is OR'ed (same rules as ActivityIndex.rows)."""
+    mask = None
+    for col, values in filters.items():
+        if not isinstance(values, (list, tuple, set)):
+            values = [values]
+        column_type = table.schema.field(col).type
+        if pa.types.is_dictionary(column_type):
+            column_type = column_type.value_type
+        matched = pc.is_in(table[col], value_set=pa.array(list(values), type=column_type))
+        mask = matched if mask is None else pc.and_(mask, matched)
+    return mask
+
+class SharedFrame:
+    """Picklable handle to a frame (or a filtered slice of it) in a memory-mapped Arrow IPC file.
+
+    Workers receive the path and filters instead of pickled rows; load() maps the file,
+    filters in Arrow and only materializes the matching rows as pandas.
+    """
+
+    def __init__(self, path, filters=None, columns=None):
+        self.path = path
+        self.filters = dict(filters or {})
+        self.columns = columns
+
+    def where(self, **filters):
+        return SharedFrame(self.path, {**self.filters, **filters}, self.columns)
+
+    def select(self, columns):
+        return SharedFrame(self.path, self.filters, list(columns))
+
+    def load(self):
+        table = open_ipc(self.path)
+        if self.columns is not None:
+            table = table.select([col for col in self.columns if col in table.column_names])
+        if self.filters:
+            table = table.filter(filter_mask(table, self.filters))
+        return table.to_pandas()
+
+    def __repr__(self):
+        return f"SharedFrame({os.path.basename(self.path)!r}, filters={self.filters})"
+
+def resolve_frame(frame):
+    """Materialize a SharedFrame; DataFrames and None pass through."""
+    return frame.load() if isinstance(frame, SharedFrame) else frame
+
+@contextmanager
+def shared_frames(frames, shared_dir=None):
+    """Persist {name: DataFrame} as memory-mapped IPC files and yield {name: SharedFrame}.
+
+    The files are removed on exit, so every worker must be done with them by then.
+    """
+    paths = {}
+    try:
+        for name, df in frames.items():
+            with stage(f"shared:{name}", rows=len(df)):
+                paths[name] = write_shared_file(name, df, shared_dir)
+        yield {name: SharedFrame(path) for name, path in paths.items()}
+    finally:
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
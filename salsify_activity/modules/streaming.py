@@ -0,0 +1,64 @@
+# === streaming.py ===
+import pandas as pd
+from .load_data import get_source_paths
+from .schema import REQUIRED_COLUMNS, normalize_column_name, normalize_brands
+from .timestamps import parse_export_timestamps
+from .cube import build_activity_cube, merge_cubes
+from .dedupe import FINGERPRINT_COLUMNS, SeenIndex, dedupe_activity
+from .summarize import build_distinct_sketches, merge_sketch_maps
+
+DEFAULT_CHUNK_SIZE = 250_000
+# Partial cubes are folded into the running cube in batches: re-grouping the running cube
+# on every chunk makes the total work grow with chunks × cube size
+MERGE_EVERY_CHUNKS = 16
+
+def iter_export_chunks(path, label, chunk_size=DEFAULT_CHUNK_SIZE, usecols=REQUIRED_COLUMNS):
+    """Yield parsed chunks of one export holding only `usecols` (the required columns must be among them)."""
+    keep = set(usecols)
+    reader = pd.read_csv(
+        path,
+        usecols=lambda col: normalize_column_name(col) in keep,
+        dtype=str,
+        chunksize=chunk_size,
+    )
+    for chunk in reader:
+        chunk.columns = [normalize_column_name(col) for col in chunk.columns]
+        missing = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing required columns in file {label}: {', '.join(missing)}")
+        chunk["timestamp"] = parse_export_timestamps(chunk["timestamp"])
+        yield normalize_brands(chunk)
+
+def stream_activity_cube(chunk_size=DEFAULT_CHUNK_SIZE, dedupe=True, sketches=None):
+    """Fold every export into the activity cube chunk by chunk; memory is bounded by chunk size plus cube size
+    (and up to MERGE_EVERY_CHUNKS partial cubes).
+
+    With dedupe, the fingerprints of every row seen so far are kept as well, 8 bytes per row (see SeenIndex).
+    Pass a dict as sketches to also fold distinct-product sketches into it, chunk by chunk.
+    """
+    cube = None
+    pending = []
+    rows = 0
+    seen = SeenIndex() if dedupe else None
+    usecols = list(dict.fromkeys(REQUIRED_COLUMNS + FINGERPRINT_COLUMNS)) if dedupe else REQUIRED_COLUMNS
+    if sketches is not None:
+        usecols = list(dict.fromkeys(usecols + ["product_id"]))
+    for label, path in get_source_paths().items():
+        print(f"\n🌊 Streaming file: {label} ({path})")
+        for chunk in iter_export_chunks(path, label, chunk_size, usecols):
+            if dedupe:
+                chunk = dedupe_activity(chunk, seen, label)
+            pending.append(build_activity_cube(chunk, verbose=False))
+            if sketches is not None and "product_id" in chunk.columns:
+                sketches.update(merge_sketch_maps(sketches, build_distinct_sketches(chunk)))
+            rows += len(chunk)
+            if len(pending) >= MERGE_EVERY_CHUNKS:
+                cube, pending = merge_cubes([cube] + pending), []
+        if pending:
+            cube, pending = merge_cubes([cube] + pending), []
+        print(f"✅ {label}: folded, {rows} rows so far, cube has {len(cube) if cube is not None else 0} cells")
+
+    if cube is None:
+        cube = merge_cubes([])
+    print(f"🧊 Streamed activity cube: {rows} rows -> {len(cube)} cells")
+    return cube
@@ -1,29 +1,280 @@
 # === summarize.py ===
+import os
+import numpy as np
 import pandas as pd
+from .schema import canonical_text
+
+def count_values(series):
+    counts = series.value_counts()
+    # Categorical columns report every category, including ones absent from this slice
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        counts = counts[counts > 0]
+        counts.index = counts.index.astype(object)
+    return counts
 
 def generate_summaries(df):
-    top_fields = df["property_name"].value_counts().head(50).reset_index()
+    top_fields = count_values(df["property_name"]).head(50).reset_index()
     top_fields.columns = ["property_name", "change_count"]
 
-    all_users = df["user_email"].value_counts().reset_index()
+    all_users = count_values(df["user_email"]).reset_index()
     all_users.columns = ["user", "change_count"]
 
-    top_brands = df["brand"].value_counts().head(50).reset_index()
+    top_brands = count_values(df["brand"]).head(50).reset_index()
     top_brands.columns = ["brand", "change_count"]
 
     return top_fields, all_users, top_brands
 
-def generate_breakdowns(df, top_items, group_col):
-    breakdowns = []
-    for val in top_items[group_col]:
-        subset = df[df[group_col] == val]
-        top_users = (
-            subset["user_email"]
-            .value_counts()
-            .head(5)
-            .reset_index()
-            .rename(columns={"index": "user", "user_email": "change_count"})
-        )
-        top_users.insert(0, group_col, val)
-        breakdowns.append(top_users)
-    return pd.concat(breakdowns, ignore_index=True)
+def top_users_per_group(counts, top_items, group_col, top_n=5):
+    # counts holds one row per (group, user) with its change_count
+    rank = {val: i for i, val in enumerate(top_items[group_col].tolist())}
+
+    counts = counts[counts["change_count"] > 0].copy()
+    counts["_rank"] = counts[group_col].astype(object).map(rank)
+    counts = counts.sort_values(["_rank", "change_count"], ascending=[True, False], kind="stable")
+    top_users = counts.groupby("_rank", sort=False).head(top_n)
+
+    top_users = top_users.drop(columns="_rank").rename(columns={"user_email": "user"})
+    for col in [group_col, "user"]:
+        top_users[col] = top_users[col].astype(object)
+    return top_users.reset_index(drop=True)
+
+def generate_breakdowns(df, top_items, group_col, top_n=5):
+    # One grouped pass over the rows in the top groups instead of one mask per group
+    subset = df.loc[df[group_col].isin(top_items[group_col].tolist()), [group_col, "user_email"]]
+    counts = (
+        subset.groupby([group_col, "user_email"], sort=False, observed=True)
+        .size()
+        .reset_index(name="change_count")
+    )
+    return top_users_per_group(counts, top_items, group_col, top_n)
+
+
+# --- Distinct-count sketches -------------------------------------------------
+# HyperLogLog with 2**HLL_PRECISION registers. Relative standard error is
+# 1.04 / sqrt(2**p): 1.6% at p=12, so ~95% of estimates land within ±3.3% and
+# ~99.7% within ±4.9% of the true count. Groups with at most EXACT_DISTINCT_LIMIT
+# distinct values keep their hashes instead and report exact counts.
+HLL_PRECISION = 12
+EXACT_DISTINCT_LIMIT = 512
+
+def value_hashes(series):
+    """64-bit hash per value (nulls included); values hash as canonical_text() so 593, 593.0 and "593" collide on purpose."""
+    # IDs repeat heavily — hash each distinct value once, then gather by code
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    uniques = pd.Series(canonical_text(pd.Series(uniques)), dtype=object)
+    return pd.util.hash_pandas_object(uniques, index=False).to_numpy()[codes]
+
+def leading_zeros(values):
+    """Leading zero bits of each uint64 (64 for zero).
+
+    float64 holds 53 bits exactly, so the bit length comes from frexp on the top 53 bits.
+    """
+    high = values >> np.uint64(11)
+    bit_length = np.where(
+        high > 0,
+        np.frexp(high.astype(np.float64))[1] + 11,
+        np.frexp(values.astype(np.float64))[1],
+    )
+    return (64 - bit_length).astype(np.uint8)
+
+def hll_positions(hashes, precision=HLL_PRECISION):
+    """Register index (top p bits) and rank (leading zeros of the rest + 1) per hash."""
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes << np.uint64(precision)
+    rank = np.minimum(leading_zeros(rest), 64 - precision) + 1
+    return index, rank.astype(np.uint8)
+
+class DistinctSketch:
+    """Mergeable distinct counter: exact hash set while small, HyperLogLog registers after."""
+
+    def __init__(self, exact=None, registers=None, precision=HLL_PRECISION, exact_limit=EXACT_DISTINCT_LIMIT):
+        self.precision = precision
+        self.exact_limit = exact_limit
+        self.exact = np.unique(np.asarray(exact if exact is not None else [], dtype=np.uint64))
+        self.registers = registers
+        if self.registers is None and len(self.exact) > exact_limit:
+            self._promote()
+
+    @property
+    def is_exact(self):
+        return self.registers is None
+
+    def _promote(self):
+        self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+        self._update(self.exact)
+        self.exact = np.empty(0, dtype=np.uint64)
+
+    def _update(self, hashes):
+        index, rank = hll_positions(hashes, self.precision)
+        np.maximum.at(self.registers, index, rank)
+
+    def add(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if self.is_exact:
+            self.exact = np.union1d(self.exact, hashes)
+            if len(self.exact) > self.exact_limit:
+                self._promote()
+        else:
+            self._update(hashes)
+        return self
+
+    def merge(self, other):
+        """Union of two sketches (e.g. the same user across quarters); neither input is modified."""
+        if self.precision != other.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        if self.is_exact and other.is_exact:
+            return DistinctSketch(np.union1d(self.exact, other.exact), precision=self.precision, exact_limit=self.exact_limit)
+
+        merged = DistinctSketch(precision=self.precision, exact_limit=self.exact_limit)
+        merged.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+        for sketch in (self, other):
+            if sketch.is_exact:
+                merged._update(sketch.exact)
+            else:
+                np.maximum(merged.registers, sketch.registers, out=merged.registers)
+        return merged
+
+    def estimate(self):
+        if self.is_exact:
+            return len(self.exact)
+
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        # Linear counting is more accurate while many registers are still empty
+        if raw <= 2.5 * m and empty:
+            return int(round(m * np.log(m / empty)))
+        return int(round(raw))
+
+def distinct_sketches(df, by, value_col="product_id", hashes=None, precision=HLL_PRECISION, exact_limit=EXACT_DISTINCT_LIMIT):
+    """{group key: DistinctSketch} of value_col per group, built with vectorized passes over the rows.
+
+    Groups with no more than exact_limit distinct values are kept exact and larger ones go to
+    registers, the same rule DistinctSketch.add/merge apply, so sketches built over parts of
+    the rows and merged equal one build over all of them.
+    Pass precomputed value_hashes(df[value_col]) to share them between several groupings;
+    df must then have no null values in value_col.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    if hashes is None:
+        df = df[df[value_col].notna()]
+        hashes = value_hashes(df[value_col])
+    grouper = df.groupby(by, sort=False, observed=True)
+    # Rows with a missing key get NaN group numbers and are left out
+    codes = grouper.ngroup().to_numpy()
+    valid = ~np.isnan(codes) if codes.dtype.kind == "f" else np.ones(len(codes), dtype=bool)
+    keys = grouper.size().index.tolist()
+    if not keys:
+        return {}
+    # One entry per distinct (group, value), so the exact/registers split counts values, not rows
+    pairs = pd.DataFrame({"code": codes[valid].astype(np.int64), "hash": hashes[valid]}).drop_duplicates()
+    codes, hashes = pairs["code"].to_numpy(), pairs["hash"].to_numpy()
+    large = np.bincount(codes, minlength=len(keys)) > exact_limit
+    in_large = large[codes]
+
+    # Registers for every large group in one scatter-max
+    m = 1 << precision
+    slots = np.full(len(keys), -1, dtype=np.int64)
+    slots[large] = np.arange(int(large.sum()))
+    registers = np.zeros((int(large.sum()), m), dtype=np.uint8)
+    index, rank = hll_positions(hashes[in_large], precision)
+    np.maximum.at(registers.reshape(-1), slots[codes[in_large]] * m + index, rank)
+
+    # Hashes of the small groups, sorted so each group is a contiguous run
+    small_codes, small_hashes = codes[~in_large], hashes[~in_large]
+    order = np.lexsort((small_hashes, small_codes))
+    small_codes, small_hashes = small_codes[order], small_hashes[order]
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(small_codes, minlength=len(keys)))])
+
+    sketches = {}
+    for i, key in enumerate(keys):
+        if large[i]:
+            sketches[key] = DistinctSketch(registers=registers[slots[i]], precision=precision, exact_limit=exact_limit)
+        else:
+            sketches[key] = DistinctSketch(small_hashes[bounds[i]:bounds[i + 1]], precision=precision, exact_limit=exact_limit)
+    return sketches
+
+def merge_sketches(*sketch_maps):
+    """Merge {key: DistinctSketch} maps, e.g. per-quarter or per-brand builds, key by key."""
+    merged = {}
+    for sketches in sketch_maps:
+        for key, sketch in sketches.items():
+            merged[key] = merged[key].merge(sketch) if key in merged else sketch
+    return merged
+
+def distinct_counts(sketches, by, label="distinct_products"):
+    by = [by] if isinstance(by, str) else list(by)
+    keys = list(sketches)
+    frame = pd.DataFrame(
+        [key if isinstance(key, tuple) else (key,) for key in keys],
+        columns=by,
+    ) if keys else pd.DataFrame(columns=by)
+    frame[label] = [sketches[key].estimate() for key in keys]
+    frame["exact"] = [sketches[key].is_exact for key in keys]
+    return frame.sort_values(label, ascending=False, kind="stable").reset_index(drop=True)
+
+# Distinct-product rollups: scope -> column of the rows it is keyed on (month is UTC year-month)
+DISTINCT_SCOPES = {"user": "user_email", "brand": "brand", "month": "month"}
+
+def build_distinct_sketches(df, value_col="product_id"):
+    """{scope: {key: DistinctSketch}} of distinct value_col per user, brand and month; keys are strings."""
+    if value_col not in df.columns:
+        raise ValueError(f"Distinct counts need the '{value_col}' column")
+
+    rows = df.loc[df[value_col].notna(), ["user_email", "brand", value_col]]
+    # Year and month, so January 2024 and January 2025 stay apart
+    rows["month"] = df["timestamp"].dt.tz_localize(None).dt.to_period("M")
+    hashes = value_hashes(rows[value_col])
+    return {
+        scope: {str(key): sketch for key, sketch in distinct_sketches(rows, col, value_col, hashes).items()}
+        for scope, col in DISTINCT_SCOPES.items()
+    }
+
+def merge_sketch_maps(*sketch_maps):
+    """merge_sketches() scope by scope for build_distinct_sketches() outputs."""
+    scopes = dict.fromkeys(scope for sketches in sketch_maps for scope in sketches)
+    return {scope: merge_sketches(*(sketches.get(scope, {}) for sketches in sketch_maps)) for scope in scopes}
+
+def distinct_summaries(sketch_maps):
+    return {scope: distinct_counts(sketches, scope) for scope, sketches in sketch_maps.items()}
+
+def generate_distinct_summaries(df, value_col="product_id"):
+    """Distinct products touched per user, per brand and per month (UTC), as DataFrames."""
+    return distinct_summaries(build_distinct_sketches(df, value_col))
+
+def save_sketch_maps(path, sketch_maps):
+    """Write build_distinct_sketches() output to one .npz: keys, exact hash runs and register rows per scope."""
+    arrays = {}
+    for scope, sketches in sketch_maps.items():
+        keys = list(sketches)
+        exact = [sketches[key] for key in keys if sketches[key].is_exact]
+        hll = [sketches[key] for key in keys if not sketches[key].is_exact]
+        arrays[f"{scope}.keys"] = np.array(keys, dtype=str)
+        arrays[f"{scope}.is_exact"] = np.array([sketches[key].is_exact for key in keys], dtype=bool)
+        arrays[f"{scope}.exact"] = np.concatenate([s.exact for s in exact]) if exact else np.empty(0, dtype=np.uint64)
+        arrays[f"{scope}.sizes"] = np.array([len(s.exact) for s in exact], dtype=np.int64)
+        arrays[f"{scope}.registers"] = np.stack([s.registers for s in hll]) if hll else np.empty((0, 1 << HLL_PRECISION), dtype=np.uint8)
+
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, precision=HLL_PRECISION, exact_limit=EXACT_DISTINCT_LIMIT, **arrays)
+    os.replace(tmp_path, path)
+
+def load_sketch_maps(path):
+    with np.load(path) as data:
+        precision, exact_limit = int(data["precision"]), int(data["exact_limit"])
+        if precision != HLL_PRECISION:
+            raise ValueError(f"Cannot use sketches with precision {precision} from {path} (expected {HLL_PRECISION})")
+
+        sketch_maps = {}
+        for scope in [name[:-len(".keys")] for name in data.files if name.endswith(".keys")]:
+            keys, is_exact = data[f"{scope}.keys"].tolist(), data[f"{scope}.is_exact"]
+            exact_runs = np.split(data[f"{scope}.exact"], np.cumsum(data[f"{scope}.sizes"])[:-1])
+            registers = iter(data[f"{scope}.registers"])
+            runs = iter(exact_runs)
+            sketch_maps[scope] = {
+                key: DistinctSketch(next(runs), precision=precision, exact_limit=exact_limit) if exact
+                else DistinctSketch(registers=next(registers).copy(), precision=precision, exact_limit=exact_limit)
+                for key, exact in zip(keys, is_exact)
+            }
+    return sketch_maps
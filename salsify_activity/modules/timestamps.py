@@ -0,0 +1,55 @@
+# === timestamps.py ===
+import numpy as np
+import pandas as pd
+
+# Salsify exports stamp every change as "yy-mm-dd HH:MM:SS +hhmm"
+EXPORT_TIMESTAMP_PATTERN = r"^(\d{2}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) ?([+-])(\d{2}):?(\d{2})$"
+LOCAL_FORMAT = "%y-%m-%d %H:%M:%S"
+# Same pattern with named groups, for pyarrow.compute.extract_regex
+ARROW_TIMESTAMP_PATTERN = r"^(?P<local>\d{2}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) ?(?P<sign>[+-])(?P<hours>\d{2}):?(?P<minutes>\d{2})$"
+
+def parse_export_timestamps(values):
+    """Parse export timestamp strings to tz-aware UTC, returning NaT for anything malformed."""
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        return values.dt.tz_convert("UTC")
+
+    # Exports repeat the same second many times — parse each distinct string once
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    uniques = pd.Series(uniques, dtype=object).astype(str).str.strip()
+
+    parts = uniques.str.extract(EXPORT_TIMESTAMP_PATTERN)
+    local = pd.to_datetime(parts[0], format=LOCAL_FORMAT, errors="coerce")
+
+    sign = np.where(parts[1] == "-", -1, 1)
+    offset_minutes = sign * (
+        pd.to_numeric(parts[2], errors="coerce") * 60 + pd.to_numeric(parts[3], errors="coerce")
+    )
+    parsed = (local - pd.to_timedelta(offset_minutes, unit="m")).dt.tz_localize("UTC")
+
+    # allow_fill maps the -1 code for missing inputs to NaT
+    return pd.Series(parsed.array.take(codes, allow_fill=True), index=values.index, name=values.name)
+
+def parse_export_timestamps_arrow(values):
+    """Arrow counterpart of parse_export_timestamps: takes an Arrow string array, returns Arrow timestamp[ns, UTC]."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # Same trick as above — parse each distinct string once, then gather by index
+    distinct = pc.unique(values)
+    parts = pc.extract_regex(pc.utf8_trim_whitespace(distinct), ARROW_TIMESTAMP_PATTERN)
+    local_text = pc.struct_field(parts, "local")
+
+    # strptime rolls impossible dates forward (25-02-30 -> 25-03-02); only keep exact round trips
+    local = pc.strptime(local_text, format=LOCAL_FORMAT, unit="s", error_is_null=True)
+    local = pc.if_else(pc.equal(pc.strftime(local, format=LOCAL_FORMAT), local_text), local, None)
+
+    offset_minutes = pc.add(
+        pc.multiply(pc.struct_field(parts, "hours").cast(pa.int64()), 60),
+        pc.struct_field(parts, "minutes").cast(pa.int64()),
+    )
+    offset_minutes = pc.if_else(pc.equal(pc.struct_field(parts, "sign"), "-"), pc.negate(offset_minutes), offset_minutes)
+    offset = pc.multiply(offset_minutes, 60).cast(pa.duration("s"))
+
+    parsed = pc.subtract(local, offset).cast(pa.timestamp("ns", tz="UTC"))
+    return pc.take(parsed, pc.index_in(values, value_set=distinct))
@@ -1,26 +1,101 @@
 # === write_helpers.py ===
+import hashlib
+import pandas as pd
+
+def column_values(series):
+    # Plain Python scalars with None for missing, which xlsxwriter skips or blanks
+    values = series.to_numpy(dtype=object)
+    values[pd.isna(values)] = None
+    return values.tolist()
+
+def write_block(ws, first_row, first_col, frame, formats=None, skip_missing=False):
+    """Write a frame through xlsxwriter's bulk writers; formats maps column -> format.
+
+    Column-by-column normally; row by row when the workbook is in constant_memory
+    mode, which flushes each row as soon as a later one is written. With skip_missing,
+    missing cells are left unwritten (no blank formatted cell) instead of blanked.
+    """
+    formats = formats or {}
+    columns = [column_values(frame[col]) for col in frame.columns]
+    col_formats = [formats.get(col) for col in frame.columns]
+
+    if not getattr(ws, "constant_memory", False):
+        for c, (values, fmt) in enumerate(zip(columns, col_formats)):
+            present = frame.iloc[:, c].notna().to_numpy()
+            if skip_missing and not present.all():
+                # Sparse column (e.g. subtotals on each group's first row): only its present cells
+                for r in present.nonzero()[0]:
+                    ws.write(first_row + r, first_col + c, values[r], fmt)
+            else:
+                ws.write_column(first_row, first_col + c, values, fmt)
+        return
+
+    for r, row in enumerate(zip(*columns)):
+        for c, value in enumerate(row):
+            if value is None and skip_missing:
+                continue
+            ws.write(first_row + r, first_col + c, value, col_formats[c])
+
+def write_table_sheet(writer, frame, sheet_name, formats=None):
+    """to_excel(index=False) equivalent that only writes in row order, so it is safe in constant_memory mode."""
+    ws = writer.book.add_worksheet(sheet_name)
+    header_format = writer.book.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+    ws.write_row(0, 0, [str(col) for col in frame.columns], header_format)
+    write_block(ws, 1, 0, frame, formats)
+    return ws
 
 def write_breakdown_table(ws, grouped_df, group_col):
     row_cursor = 0
     headers = grouped_df.columns.tolist()
 
-    for group_val in grouped_df[group_col].unique():
-        subset = grouped_df[group_col] == group_val
-        rows = grouped_df[subset].reset_index(drop=True)
+    for _, rows in grouped_df.groupby(group_col, sort=False, observed=True):
+        ws.write_row(row_cursor, 0, headers)
+        write_block(ws, row_cursor + 1, 0, rows)
+        row_cursor += len(rows) + 3
 
-        for col_idx, header in enumerate(headers):
-            ws.write(row_cursor, col_idx, header)
 
-        for r, (_, row) in enumerate(rows.iterrows(), start=1):
-            for c, value in enumerate(row):
-                ws.write(row_cursor + r, c, value)
+# autofit_columns tuning: rows sampled per column, width cap, and how many columns
+# get measured before the rest of a very wide sheet falls back to DEFAULT_COLUMN_WIDTH
+AUTOFIT_SAMPLE_ROWS = 2000
+AUTOFIT_MAX_WIDTH = 80
+AUTOFIT_MAX_COLUMNS = 200
+DEFAULT_COLUMN_WIDTH = 12
 
-        row_cursor += len(rows) + 3
+# Widths keyed by column name, dtype and a digest of the sampled values; cleared when full
+WIDTH_CACHE_MAX_ENTRIES = 4096
+_width_cache = {}
+
+def column_sample(series, sample_rows=AUTOFIT_SAMPLE_ROWS):
+    if len(series) <= sample_rows:
+        return series
+    sample = series.sample(n=sample_rows, random_state=0)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        # Extremes are cheap to find and usually the widest values
+        sample = pd.concat([sample, pd.Series([series.min(), series.max()])])
+    return sample
+
+def column_signature(series, sample):
+    digest = hashlib.blake2b(pd.util.hash_pandas_object(sample, index=False).to_numpy().tobytes(), digest_size=16)
+    return (str(series.name), str(series.dtype), len(sample), digest.hexdigest())
+
+def measure_column_width(series, sample):
+    data_len = sample.astype(str).str.len().max() if len(sample) else 0
+    return max(int(data_len), len(str(series.name)))
+
+def autofit_columns(ws, dataframe, start_row=0, start_col=0, sample_rows=None, max_width=None, max_columns=None):
+    sample_rows = sample_rows or AUTOFIT_SAMPLE_ROWS
+    max_width = max_width or AUTOFIT_MAX_WIDTH
+    max_columns = max_columns or AUTOFIT_MAX_COLUMNS
 
+    for i, col in enumerate(dataframe.columns[:max_columns]):
+        series = dataframe[col]
+        sample = column_sample(series, sample_rows)
+        key = column_signature(series, sample)
+        if key not in _width_cache:
+            if len(_width_cache) >= WIDTH_CACHE_MAX_ENTRIES:
+                _width_cache.clear()
+            _width_cache[key] = measure_column_width(series, sample)
+        ws.set_column(start_col + i, start_col + i, min(_width_cache[key], max_width) + 2)
 
-def autofit_columns(ws, dataframe, start_row=0, start_col=0):
-    for i, col in enumerate(dataframe.columns):
-        max_len = max(
-            [len(str(val)) for val in dataframe[col].astype(str)] + [len(col)]
-        )
-        ws.set_column(start_col + i, start_col + i, max_len + 2)
+    if len(dataframe.columns) > max_columns:
+        ws.set_column(start_col + max_columns, start_col + len(dataframe.columns) - 1, DEFAULT_COLUMN_WIDTH)
@@ -0,0 +1,52 @@
+# === query.py ===
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+from modules.query import connect, run_sql, group_counts, QUERY_COLUMNS
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Ad-hoc queries over the Salsify activity history (DuckDB over the parquet cache).",
+        epilog='Example: python query.py --by user_email --brand maax --property "Product Title" --last-days 30',
+    )
+    parser.add_argument("sql", nargs="?", help="Raw SQL against the `activity` view (overrides the filter options)")
+    parser.add_argument("--source", choices=["cache", "store"], default="cache", help="Parquet cache from main.py or the --incremental store")
+    parser.add_argument("--no-dedupe", action="store_true", help="Keep rows repeated across overlapping exports (cache source)")
+    parser.add_argument("--by", nargs="+", default=["user_email"], choices=QUERY_COLUMNS, help="Columns to group by")
+    parser.add_argument("--brand")
+    parser.add_argument("--property", dest="property_name")
+    parser.add_argument("--user")
+    parser.add_argument("--since", help="Inclusive start date, YYYY-MM-DD (UTC)")
+    parser.add_argument("--until", help="Inclusive end date, YYYY-MM-DD (UTC)")
+    parser.add_argument("--last-days", type=int, help="Shortcut for --since N days ago")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--csv", help="Write the result to this CSV file instead of printing it")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    start = time.perf_counter()
+    con = connect(source=args.source, dedupe=not args.no_dedupe)
+
+    if args.sql:
+        result = run_sql(args.sql, con=con)
+    else:
+        since = args.since or (date.today() - timedelta(days=args.last_days) if args.last_days else None)
+        result = group_counts(
+            args.by,
+            brand=args.brand,
+            property_name=args.property_name,
+            user=args.user,
+            since=since,
+            until=args.until,
+            limit=args.limit,
+            con=con,
+        )
+
+    if args.csv:
+        result.to_csv(args.csv, index=False)
+        print(f"✅ {len(result)} rows written to {args.csv}")
+    else:
+        print(result.to_string(index=False) if not result.empty else "(no rows)")
+    print(f"⏱️ {time.perf_counter() - start:.3f}s", file=sys.stderr)